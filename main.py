@@ -1,51 +1,87 @@
 #!/usr/bin/env python3
 import asyncio
-import json
+import atexit
 import logging
+import queue
 import argparse
+import multiprocessing
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from typing import List, Dict
 
-from src.scraper.redbus_scraper import RedBusScraper
-from src.database.data_manager import DataManager
+import orjson
+
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    # uvloop is optional and unavailable on Windows; fall back to the default loop
+    pass
+
+from src.scraper.redbus_scraper import NAVIGATIONS_PER_MINUTE, BrowserPool, JsonlWriter, RedBusScraper
+from src.database.data_manager import get_data_manager, storage_succeeded
 
 def setup_logging():
     """Setup logging configuration"""
     Path("logs").mkdir(exist_ok=True)
     
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('logs/main.log'),
-            logging.StreamHandler()
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [logging.FileHandler('logs/main.log'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Coroutines only enqueue records; file and console writes happen on the
+    # listener's thread instead of blocking the event loop
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    queue_handler = QueueHandler(log_queue)
+    # Only merge args into the message here; the real handlers add timestamp and level
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 
 async def scrape_single_route(source: str, destination: str, journey_date: str = None,
-                             headless: bool = True) -> Dict:
-    """Scrape a single route and return results"""
+                             headless: bool = True, pool: BrowserPool = None,
+                             force_refresh: bool = False, writer: JsonlWriter = None) -> Dict:
+    """Scrape a single route, store it and return a summary"""
     logger = logging.getLogger(__name__)
     
-    scraper = RedBusScraper(headless=headless)
-    data_manager = DataManager()
+    scraper = RedBusScraper(headless=headless, writer=writer)
+    data_manager = get_data_manager()
+    
+    storage_stats = {}
+    
+    async def store(scrape_results: Dict) -> bool:
+        storage_stats.update(await data_manager.aprocess_scraping_results(scrape_results))
+        logger.info(f"Storage stats: {storage_stats}")
+        # Cache only what reached the database, so a failed store is scraped and stored again
+        return storage_succeeded(storage_stats)
     
     try:
         logger.info(f"Starting scrape for {source} to {destination} for date {journey_date}" )
         
-        await scraper.initialize_browser()
-        scrape_results = await scraper.scrape_route(source, destination, journey_date)
+        await scraper.initialize_browser(pool)
+        scrape_results = await scraper.scrape_route(source, destination, journey_date, force_refresh, store)
         
         logger.info(f"Scraping completed. Found {len(scrape_results['buses'])} buses")
         
-        if scrape_results['buses']:
-            storage_stats = data_manager.process_scraping_results(scrape_results)
-            logger.info(f"Storage stats: {storage_stats}")
-            
+        if scrape_results.get('from_cache'):
+            # Already stored when it was first scraped
+            return {
+                'success': True,
+                'buses_found': len(scrape_results['buses'])
+            }
+        elif scrape_results['buses']:
+            # Only a summary is returned, so a multi-route run doesn't keep every bus in memory
             return {
                 'success': True,
-                'scrape_results': scrape_results,
+                'buses_found': len(scrape_results['buses']),
                 'storage_stats': storage_stats
             }
         else:
@@ -64,47 +100,135 @@ async def scrape_single_route(source: str, destination: str, journey_date: str =
     finally:
         await scraper.close()
 
-async def scrape_multiple_routes(routes_config: List[Dict], headless: bool = True) -> Dict:
-    """Scrape multiple routes from configuration"""
+async def scrape_multiple_routes(routes_config: List[Dict], headless: bool = True,
+                                 max_concurrency: int = 5, pool: BrowserPool = None,
+                                 force_refresh: bool = False, writer: JsonlWriter = None) -> Dict:
+    """Scrape multiple routes from configuration, at most max_concurrency at a time"""
     logger = logging.getLogger(__name__)
-    results = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
     
-    for i, route in enumerate(routes_config):
-        logger.info(f"Processing route {i+1}/{len(routes_config)}: {route}")
-        
-        try:
+    async def _bounded(i: int, route: Dict) -> Dict:
+        async with semaphore:
+            # Small jitter so concurrent workers don't hit the site in lockstep
+            await asyncio.sleep(random.uniform(0, 2))
+            logger.info(f"Processing route {i+1}/{len(routes_config)}: {route}")
+            
             result = await scrape_single_route(
                 source=route['source'],
                 destination=route['destination'],
                 journey_date=route.get('journey_date'),
-                headless=headless
+                headless=headless,
+                pool=pool,
+                force_refresh=force_refresh,
+                writer=writer
             )
             
-            route_key = f"{route['source']}_to_{route['destination']}"
-            results[route_key] = result
-            
             logger.info(f"Completed route {i+1}/{len(routes_config)}")
-            
-            if i < len(routes_config) - 1:
-                logger.info("Waiting 30 seconds before next route...")
-                await asyncio.sleep(30)
-                
-        except Exception as e:
-            logger.error(f"Error processing route {route}: {str(e)}")
-            results[f"{route['source']}_to_{route['destination']}"] = {
+            return result
+    
+    tasks = [_bounded(i, route) for i, route in enumerate(routes_config)]
+    results_list = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    results = {}
+    for route, result in zip(routes_config, results_list):
+        route_key = f"{route['source']}_to_{route['destination']}"
+        
+        if isinstance(result, BaseException):
+            logger.error(f"Error processing route {route}: {str(result)}")
+            result = {
                 'success': False,
-                'error': str(e)
+                'error': str(result)
             }
+        
+        results[route_key] = result
+    
+    return results
+
+async def scrape_routes_with_pool(routes_config: List[Dict], headless: bool = True,
+                                  max_concurrency: int = 5, force_refresh: bool = False,
+                                  jsonl_path: str = None,
+                                  navigations_per_minute: int = NAVIGATIONS_PER_MINUTE) -> Dict:
+    """Scrape routes on one shared browser, optionally streaming buses to jsonl_path"""
+    writer = None
+    if jsonl_path:
+        writer = JsonlWriter(jsonl_path)
+        await writer.start()
+    
+    pool = BrowserPool(headless=headless, navigations_per_minute=navigations_per_minute)
+    await pool.start()
+    try:
+        return await scrape_multiple_routes(routes_config, headless, max_concurrency, pool,
+                                            force_refresh, writer)
+    finally:
+        await pool.close()
+        if writer:
+            await writer.close()
+
+def split_evenly(total: int, parts: int) -> List[int]:
+    """Divide total between parts as evenly as possible, giving each at least 1"""
+    return [max(1, total // parts + (i < total % parts)) for i in range(parts)]
+
+def _scrape_routes_in_process(routes_config: List[Dict], headless: bool, max_concurrency: int,
+                              force_refresh: bool, jsonl_path: str = None,
+                              navigations_per_minute: int = NAVIGATIONS_PER_MINUTE) -> Dict:
+    """Worker process entry point: its own event loop, browser and database clients"""
+    setup_logging()
+    return asyncio.run(scrape_routes_with_pool(routes_config, headless, max_concurrency,
+                                               force_refresh, jsonl_path, navigations_per_minute))
+
+def scrape_routes_in_processes(routes_config: List[Dict], processes: int, headless: bool = True,
+                               max_concurrency: int = 5, force_refresh: bool = False,
+                               jsonl_path: str = None) -> Dict:
+    """Split routes across worker processes so parsing and driver overhead aren't capped at one CPU"""
+    logger = logging.getLogger(__name__)
+    # max_concurrency bounds the whole run, so never start more workers than routes may run at once
+    processes = min(processes, max_concurrency)
+    chunks = [chunk for chunk in (routes_config[i::processes] for i in range(processes)) if chunk]
+    part_paths = [f"{jsonl_path}.part{i}" if jsonl_path else None for i in range(len(chunks))]
+    # Each worker has its own semaphore and rate limiter, so share the run's budgets between them
+    concurrencies = split_evenly(max_concurrency, len(chunks))
+    navigations = split_evenly(NAVIGATIONS_PER_MINUTE, len(chunks))
+    
+    # spawn rather than fork, so workers don't inherit the parent's Mongo clients or event loop
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=len(chunks),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(_scrape_routes_in_process, chunk, headless, concurrency,
+                                force_refresh, part_path, navigations_per_minute)
+                for chunk, part_path, concurrency, navigations_per_minute
+                in zip(chunks, part_paths, concurrencies, navigations)
+            ]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    logger.error(f"Worker for {len(chunk)} routes failed: {str(e)}")
+                    for route in chunk:
+                        results[f"{route['source']}_to_{route['destination']}"] = {
+                            'success': False,
+                            'error': str(e)
+                        }
+    finally:
+        if jsonl_path:
+            with open(jsonl_path, 'ab') as merged:
+                for part_path in part_paths:
+                    part = Path(part_path)
+                    if part.exists():
+                        with part.open('rb') as f:
+                            shutil.copyfileobj(f, merged)
+                        part.unlink()
     
     return results
 
-def analyze_route_data(source: str, destination: str, days_back: int = 30):
+async def analyze_route_data(source: str, destination: str, days_back: int = 30):
     """Analyze route data and generate insights"""
-    data_manager = DataManager()
+    data_manager = get_data_manager()
     logger = logging.getLogger(__name__)
     
     try:
-        analytics = data_manager.get_route_analytics(source, destination, days_back)
+        analytics = await data_manager.aget_route_analytics(source, destination, days_back)
         
         print(f"\n=== Route Analytics: {analytics['route']} ===")
         print(f"Total Records: {analytics['total_records']}")
@@ -130,21 +254,22 @@ def analyze_route_data(source: str, destination: str, days_back: int = 30):
         logger.error(f"Error analyzing route data: {str(e)}")
         return None
 
-def export_data(source: str = None, destination: str = None, output_file: str = None):
-    """Export route data to CSV"""
-    data_manager = DataManager()
+def export_data(source: str = None, destination: str = None, output_file: str = None,
+                export_format: str = "csv"):
+    """Export route data to CSV or Parquet"""
+    data_manager = get_data_manager()
     logger = logging.getLogger(__name__)
     
     if not output_file:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         if source and destination:
-            output_file = f"data/export_{source}_{destination}_{timestamp}.csv"
+            output_file = f"data/export_{source}_{destination}_{timestamp}.{export_format}"
         else:
-            output_file = f"data/export_all_routes_{timestamp}.csv"
+            output_file = f"data/export_all_routes_{timestamp}.{export_format}"
     
     try:
         Path("data").mkdir(exist_ok=True)
-        records_exported = data_manager.export_route_data(source, destination, output_file)
+        records_exported = data_manager.export_route_data(source, destination, output_file, export_format)
         print(f"Exported {records_exported} records to {output_file}")
         return output_file
         
@@ -154,7 +279,7 @@ def export_data(source: str = None, destination: str = None, output_file: str =
 
 def list_routes():
     """List all routes in the database"""
-    data_manager = DataManager()
+    data_manager = get_data_manager()
     logger = logging.getLogger(__name__)
     
     try:
@@ -173,6 +298,13 @@ def list_routes():
         logger.error(f"Error listing routes: {str(e)}")
         return []
 
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 async def main():
     parser = argparse.ArgumentParser(description='RedBus Fare Scraper for Dynamic Pricing')
     
@@ -188,6 +320,16 @@ async def main():
     parser.add_argument('--days-back', type=int, default=30, 
                        help='Days back for analysis (default: 30)')
     parser.add_argument('--output', type=str, help='Output file path for export')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                       help='Export file format (parquet requires pyarrow)')
+    parser.add_argument('--max-concurrency', type=positive_int, default=5,
+                       help='Maximum number of routes scraped concurrently, across all processes (default: 5)')
+    parser.add_argument('--force-refresh', action='store_true',
+                       help='Ignore route results cached within the last hour')
+    parser.add_argument('--jsonl', type=str,
+                       help='Also append every scraped bus to this JSONL file')
+    parser.add_argument('--processes', type=positive_int, default=1,
+                       help='Split config routes across this many worker processes (default: 1, at most --max-concurrency)')
     
     args = parser.parse_args()
     
@@ -195,49 +337,69 @@ async def main():
     logger = logging.getLogger(__name__)
     
     if args.mode == 'scrape':
-        if args.config:
-            try:
-                with open(args.config, 'r') as f:
-                    routes_config = json.load(f)
+        writer = None
+        # Config runs open their own writer(s) alongside their browser pools
+        if args.jsonl and not args.config:
+            writer = JsonlWriter(args.jsonl)
+            await writer.start()
+        
+        try:
+            if args.config:
+                try:
+                    routes_config = orjson.loads(Path(args.config).read_bytes())
+                
+                    logger.info(f"Loaded {len(routes_config)} routes from config file")
                 
-                logger.info(f"Loaded {len(routes_config)} routes from config file")
-                results = await scrape_multiple_routes(routes_config, args.headless)
+                    if args.processes > 1:
+                        results = await asyncio.get_running_loop().run_in_executor(
+                            None, scrape_routes_in_processes, routes_config, args.processes,
+                            args.headless, args.max_concurrency, args.force_refresh, args.jsonl
+                        )
+                    else:
+                        results = await scrape_routes_with_pool(routes_config, args.headless,
+                                                                args.max_concurrency, args.force_refresh,
+                                                                args.jsonl)
                 
-                print("\n=== Scraping Results Summary ===")
-                for route_key, result in results.items():
-                    status = "✓" if result['success'] else "✗"
-                    print(f"{status} {route_key.replace('_', ' ')}")
+                    print("\n=== Scraping Results Summary ===")
+                    for route_key, result in results.items():
+                        status = "✓" if result['success'] else "✗"
+                        print(f"{status} {route_key.replace('_', ' ')}")
                     
-            except Exception as e:
-                logger.error(f"Error loading config file: {str(e)}")
+                except Exception as e:
+                    logger.error(f"Error loading config file: {str(e)}")
                 
-        elif args.source and args.destination:
-            result = await scrape_single_route(
-                source=args.source,
-                destination=args.destination,
-                journey_date=args.date,
-                headless=args.headless
-            )
+            elif args.source and args.destination:
+                result = await scrape_single_route(
+                    source=args.source,
+                    destination=args.destination,
+                    journey_date=args.date,
+                    headless=args.headless,
+                    force_refresh=args.force_refresh,
+                    writer=writer
+                )
             
-            if result['success']:
-                print(f"✓ Successfully scraped {args.source} to {args.destination}")
-                if 'storage_stats' in result:
-                    stats = result['storage_stats']
-                    print(f"  Stored: {stats['successfully_stored']}/{stats['total_buses']} buses")
-            else:
-                print(f"✗ Failed to scrape {args.source} to {args.destination}: {result.get('error', 'Unknown error')}")
+                if result['success']:
+                    print(f"✓ Successfully scraped {args.source} to {args.destination}")
+                    if 'storage_stats' in result:
+                        stats = result['storage_stats']
+                        print(f"  Stored: {stats['successfully_stored']}/{stats['total_buses']} buses")
+                else:
+                    print(f"✗ Failed to scrape {args.source} to {args.destination}: {result.get('error', 'Unknown error')}")
                 
-        else:
-            print("For scrape mode, provide either --config file or --source and --destination")
+            else:
+                print("For scrape mode, provide either --config file or --source and --destination")
+        finally:
+            if writer:
+                await writer.close()
     
     elif args.mode == 'analyze':
         if args.source and args.destination:
-            analyze_route_data(args.source, args.destination, args.days_back)
+            await analyze_route_data(args.source, args.destination, args.days_back)
         else:
             print("For analyze mode, provide --source and --destination")
     
     elif args.mode == 'export':
-        export_data(args.source, args.destination, args.output)
+        export_data(args.source, args.destination, args.output, args.format)
     
     elif args.mode == 'list':
         list_routes()
@@ -1,11 +1,38 @@
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 import csv
+from playwright.async_api import async_playwright
 import argparse
 
+from src.scraper.redbus_scraper import block_unneeded_requests
+
 RED_BUS_URL = "https://www.redbus.in/"
 
+BUS_CARD_SELECTOR = "li.tupleWrapper___04f2bd"
+BUS_FIELD_SELECTORS = {
+    'name': ".travelsName___854b5a",
+    'type': ".busType___87f844",
+    'departure': ".boardingTime___ca56c9",
+    'arrival': ".droppingTime___70b12b",
+    'duration': ".duration___916eff",
+    'total_seats': ".totalSeats___7f6310",
+    'single_seats': ".singleSeats___63f11c",
+    'price': ".finalFare___4bd28c",
+    'rating': ".rating___b0d40f",
+}
+OPTIONAL_BUS_FIELDS = frozenset({'single_seats', 'rating'})
+
+# Walks each card once and reads every field selector from it
+EXTRACT_BUSES_JS = """([cardSelector, fieldSelectors]) => {
+    const fields = Object.entries(fieldSelectors);
+    return Array.from(document.querySelectorAll(cardSelector), li => {
+        const bus = {};
+        for (const [key, sel] of fields) {
+            bus[key] = li.querySelector(sel)?.innerText.trim() || null;
+        }
+        return bus;
+    });
+}"""
+
 # -----------------------
 # City selection function
 # -----------------------
@@ -17,42 +44,25 @@ async def pick_city(page, label_text: str, city: str):
     await textbox.wait_for(state="visible", timeout=10000)
 
     await textbox.fill("")
-    await textbox.type(city, delay=60)
-    await page.wait_for_timeout(1000)
+    # Typed key by key because the suggestions only react to keystroke events
+    await textbox.type(city, delay=20)
 
     option = page.locator("[role='listbox'] [role='option']").first
+    await option.wait_for(state="visible", timeout=5000)
     await option.click()
 
 # -----------------------
 # Scrape bus details
 # -----------------------
 async def scrape_buses(page):
-    html = await page.content()
-    soup = BeautifulSoup(html, "html.parser")
-
-    buses = []
-    for bus_li in soup.select("li.tupleWrapper___04f2bd"):
-        bus = {}
-        try:
-            bus['name'] = bus_li.select_one(".travelsName___854b5a").text.strip()
-            bus['type'] = bus_li.select_one(".busType___87f844").text.strip()
-            bus['departure'] = bus_li.select_one(".boardingTime___ca56c9").text.strip()
-            bus['arrival'] = bus_li.select_one(".droppingTime___70b12b").text.strip()
-            bus['duration'] = bus_li.select_one(".duration___916eff").text.strip()
-            bus['total_seats'] = bus_li.select_one(".totalSeats___7f6310").text.strip()
-
-            single_seats_tag = bus_li.select_one(".singleSeats___63f11c")
-            bus['single_seats'] = single_seats_tag.text.strip() if single_seats_tag else None
-
-            bus['price'] = bus_li.select_one(".finalFare___4bd28c").text.strip()
-
-            rating_tag = bus_li.select_one(".rating___b0d40f")
-            bus['rating'] = rating_tag.text.strip() if rating_tag else None
+    # Extract inside the browser so only the fields we need cross the wire,
+    # instead of serializing the whole DOM with page.content()
+    rows = await page.evaluate(EXTRACT_BUSES_JS, [BUS_CARD_SELECTOR, BUS_FIELD_SELECTORS])
 
-            buses.append(bus)
-        except:
-            continue
-    return buses
+    return [
+        bus for bus in rows
+        if all(value is not None for key, value in bus.items() if key not in OPTIONAL_BUS_FIELDS)
+    ]
 
 # -----------------------
 # Main scraper function
@@ -61,7 +71,8 @@ async def scrape_redbus(source: str, destination: str):
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=False, slow_mo=50)
         page = await browser.new_page()
-        await page.goto(RED_BUS_URL)
+        await page.route("**/*", block_unneeded_requests)
+        await page.goto(RED_BUS_URL, wait_until="domcontentloaded")
 
         # Select source & destination
         await pick_city(page, "From", source)
@@ -70,7 +81,7 @@ async def scrape_redbus(source: str, destination: str):
         search_btn = page.locator("button", has_text="Search Buses")
         await search_btn.click()
 
-        await page.wait_for_selector("li.tupleWrapper___04f2bd", timeout=20000)
+        await page.wait_for_selector(BUS_CARD_SELECTOR, timeout=20000)
 
         buses = await scrape_buses(page)
 
@@ -79,9 +90,8 @@ async def scrape_redbus(source: str, destination: str):
             print(b)
 
         if buses:
-            keys = buses[0].keys()
             with open("buses.csv", "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=keys)
+                writer = csv.DictWriter(f, fieldnames=list(BUS_FIELD_SELECTORS))
                 writer.writeheader()
                 writer.writerows(buses)
             print(f"\nSaved {len(buses)} buses to buses.csv")
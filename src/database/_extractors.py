@@ -0,0 +1,51 @@
+"""Scraped-text parsers, kept dependency-free and fully typed so mypyc can compile them"""
+import re
+from typing import Dict, Optional
+
+_NUM_RE = re.compile(r'(\d+\.?\d*)')
+_INT_RE = re.compile(r'(\d+)')
+
+def parse_route_info(route_string: str) -> Optional[Dict[str, str]]:
+    """Parse route string like 'Hyderabad to Bangalore' into source and destination"""
+    if isinstance(route_string, str) and ' to ' in route_string:
+        parts = route_string.split(' to ')
+        if len(parts) == 2:
+            return {
+                'source': parts[0].strip(),
+                'destination': parts[1].strip()
+            }
+    return None
+
+def extract_rating(rating_str: Optional[str]) -> Optional[float]:
+    """Extract numeric rating from rating string"""
+    if not rating_str or rating_str == 'N/A':
+        return None
+    
+    rating_match = _NUM_RE.search(rating_str)
+    if rating_match:
+        rating = float(rating_match.group(1))
+        return rating if 0 <= rating <= 5 else None
+    
+    return None
+
+def extract_price(price_str: Optional[str]) -> Optional[float]:
+    """Extract numeric price from price string"""
+    if not price_str or price_str == 'N/A':
+        return None
+    
+    price_match = _NUM_RE.search(price_str.replace(',', ''))
+    if price_match:
+        return float(price_match.group(1))
+    
+    return None
+
+def extract_seats_count(seats_str: Optional[str]) -> Optional[int]:
+    """Extract numeric seats count from seats string"""
+    if not seats_str or seats_str == 'N/A':
+        return None
+    
+    seats_match = _INT_RE.search(seats_str)
+    if seats_match:
+        return int(seats_match.group(1))
+    
+    return None
@@ -1,15 +1,35 @@
+import functools
 import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from src.models.database_models import DatabaseManager
+from src.database._extractors import extract_price, extract_rating, extract_seats_count, parse_route_info
 from bson import ObjectId
-import re
+from cachetools import TTLCache
+import numpy as np
+
+# Route analytics keyed by (source, destination, days_back). Entries expire after
+# _ANALYTICS_TTL seconds and are dropped as soon as new fares for the route are stored.
+# Only long-lived processes that import DataManager get hits; the CLI's analyze mode
+# computes analytics once per process.
+_ANALYTICS_TTL = 300
+_ANALYTICS_CACHE: TTLCache = TTLCache(maxsize=256, ttl=_ANALYTICS_TTL)
+
+def _invalidate_route_analytics(source: str, destination: str):
+    """Drop cached analytics for a route, for every days_back window"""
+    for key in [key for key in _ANALYTICS_CACHE if key[:2] == (source, destination)]:
+        _ANALYTICS_CACHE.pop(key, None)
+
+def storage_succeeded(stats: Dict) -> bool:
+    """Whether process_scraping_results stored everything it was given"""
+    return bool(stats['route_processed'] and stats['successfully_stored'] and not stats['errors'])
 
 class DataManager:
     def __init__(self, connection_string: str = "mongodb://localhost:27017", db_name: str = "redbus_fares"):
         self.db = DatabaseManager(connection_string, db_name)
         self.logger = logging.getLogger(__name__)
+        self._backfill_fare_counts()
     
     def process_scraping_results(self, scrape_results: Dict) -> Dict:
         """Process and store scraping results in the database"""
@@ -21,7 +41,7 @@ class DataManager:
         }
         
         try:
-            route_info = self._parse_route_info(scrape_results['route'])
+            route_info = parse_route_info(scrape_results['route'])
             if not route_info:
                 stats['errors'].append("Could not parse route information")
                 return stats
@@ -30,6 +50,9 @@ class DataManager:
                 source=route_info['source'],
                 destination=route_info['destination']
             )
+            if route_id is None:
+                stats['errors'].append("Could not store route")
+                return stats
             
             session_id = self.db.start_scraping_session(
                 route_id=route_id,
@@ -38,15 +61,14 @@ class DataManager:
             
             stats['total_buses'] = len(scrape_results['buses'])
             
-            for bus_data in scrape_results['buses']:
-                try:
-                    success = self._store_bus_data(bus_data, route_id, scrape_results['journey_date'])
-                    if success:
-                        stats['successfully_stored'] += 1
-                except Exception as e:
-                    error_msg = f"Error storing bus data: {str(e)}"
-                    stats['errors'].append(error_msg)
-                    self.logger.error(error_msg)
+            try:
+                stats['successfully_stored'] = self._store_buses(
+                    scrape_results['buses'], route_id, scrape_results['journey_date'], stats['errors']
+                )
+            except Exception as e:
+                error_msg = f"Error storing bus data: {str(e)}"
+                stats['errors'].append(error_msg)
+                self.logger.error(error_msg)
             
             self.db.update_scraping_session(
                 session_id=session_id,
@@ -56,6 +78,7 @@ class DataManager:
             )
             
             stats['route_processed'] = True
+            _invalidate_route_analytics(route_info['source'], route_info['destination'])
             
         except Exception as e:
             error_msg = f"Error processing scraping results: {str(e)}"
@@ -64,163 +87,249 @@ class DataManager:
         
         return stats
     
-    def _parse_route_info(self, route_string: str) -> Optional[Dict]:
-        """Parse route string like 'Hyderabad to Bangalore' into source and destination"""
-        try:
-            if ' to ' in route_string:
-                parts = route_string.split(' to ')
-                if len(parts) == 2:
-                    return {
-                        'source': parts[0].strip(),
-                        'destination': parts[1].strip()
-                    }
-        except Exception:
-            pass
-        return None
-    
-    def _store_bus_data(self, bus_data: Dict, route_id: ObjectId, journey_date: str) -> bool:
-        """Store individual bus data in the database"""
+    async def aprocess_scraping_results(self, scrape_results: Dict) -> Dict:
+        """Async version of process_scraping_results, so storage overlaps with other scrapes"""
+        stats = {
+            'route_processed': False,
+            'total_buses': 0,
+            'successfully_stored': 0,
+            'errors': []
+        }
+        
         try:
-            operator_name = bus_data.get('operator_name', 'Unknown')
-            rating = self._extract_rating(bus_data.get('rating'))
+            route_info = parse_route_info(scrape_results['route'])
+            if not route_info:
+                stats['errors'].append("Could not parse route information")
+                return stats
             
-            operator_id = self.db.insert_operator(
-                name=operator_name,
-                rating=rating
+            route_id = await self.db.ainsert_route(
+                source=route_info['source'],
+                destination=route_info['destination']
             )
+            if route_id is None:
+                stats['errors'].append("Could not store route")
+                return stats
             
-            if not operator_id:
-                return False
-            
-            service_id = self.db.insert_service(
+            session_id = await self.db.astart_scraping_session(
                 route_id=route_id,
-                operator_id=operator_id,
-                bus_type=bus_data.get('bus_type', 'Unknown'),
-                departure_time=bus_data.get('departure_time', ''),
-                arrival_time=bus_data.get('arrival_time', ''),
-                duration=bus_data.get('duration', ''),
-                rating=rating
+                journey_date=scrape_results['journey_date']
             )
             
-            starting_price = self._extract_price(bus_data.get('starting_price'))
+            stats['total_buses'] = len(scrape_results['buses'])
             
-            detailed_fares = bus_data.get('detailed_fares', [])
-            if detailed_fares:
-                for fare_detail in detailed_fares:
-                    fare_amount = self._extract_price(fare_detail.get('fare'))
-                    available_seats = self._extract_seats_count(fare_detail.get('available_seats'))
-                    
-                    if fare_amount and fare_amount > 0:
-                        self.db.insert_fare_data(
-                            service_id=service_id,
-                            journey_date=journey_date,
-                            seat_category=fare_detail.get('seat_category', 'Unknown'),
-                            fare=fare_amount,
-                            available_seats=available_seats or 0,
-                            starting_price=starting_price
-                        )
-            else:
-                if starting_price and starting_price > 0:
-                    seats_available = self._extract_seats_count(bus_data.get('seats_available'))
-                    self.db.insert_fare_data(
-                        service_id=service_id,
-                        journey_date=journey_date,
-                        seat_category='Standard',
-                        fare=starting_price,
-                        available_seats=seats_available or 0,
-                        starting_price=starting_price
-                    )
+            try:
+                stats['successfully_stored'] = await self._astore_buses(
+                    scrape_results['buses'], route_id, scrape_results['journey_date'], stats['errors']
+                )
+            except Exception as e:
+                error_msg = f"Error storing bus data: {str(e)}"
+                stats['errors'].append(error_msg)
+                self.logger.error(error_msg)
             
-            return True
+            await self.db.aupdate_scraping_session(
+                session_id=session_id,
+                total_buses=stats['total_buses'],
+                successful_scrapes=stats['successfully_stored'],
+                status='completed'
+            )
+            
+            stats['route_processed'] = True
+            _invalidate_route_analytics(route_info['source'], route_info['destination'])
             
         except Exception as e:
-            self.logger.error(f"Error storing bus data: {str(e)}")
-            return False
+            error_msg = f"Error processing scraping results: {str(e)}"
+            stats['errors'].append(error_msg)
+            self.logger.error(error_msg)
+        
+        return stats
     
-    def _extract_rating(self, rating_str: str) -> Optional[float]:
-        """Extract numeric rating from rating string"""
-        if not rating_str or rating_str == 'N/A':
-            return None
+    def _store_buses(self, buses: List[Dict], route_id: ObjectId, journey_date: str,
+                     errors: List[str]) -> int:
+        """Store all buses of a route with bulk writes instead of per-document inserts.
+
+        Anything that could not be stored is reported in errors, so callers can tell a
+        complete store from a partial one.
+        """
+        if not buses:
+            return 0
         
-        try:
-            rating_match = re.search(r'(\d+\.?\d*)', str(rating_str))
-            if rating_match:
-                rating = float(rating_match.group(1))
-                return rating if 0 <= rating <= 5 else None
-        except (ValueError, AttributeError):
-            pass
+        operator_ids = self.db.insert_operators_bulk(self._collect_operators(buses))
+        
+        services = self._build_services(buses, route_id, operator_ids)
+        service_ids = self.db.insert_services_bulk([service for service, _ in services])
+        
+        fare_records = self._build_fare_records(services, service_ids, journey_date)
+        fares_stored = sum(1 for fare_id in self.db.insert_fare_data_bulk(fare_records) if fare_id)
+        if fares_stored:
+            self.db.increment_route_fare_count(route_id, fares_stored)
         
-        return None
+        services_stored = sum(1 for service_id in service_ids if service_id)
+        self._report_store_failures(errors, len(buses), services_stored, len(fare_records), fares_stored)
+        return services_stored
     
-    def _extract_price(self, price_str: str) -> Optional[float]:
-        """Extract numeric price from price string"""
-        if not price_str or price_str == 'N/A':
-            return None
+    async def _astore_buses(self, buses: List[Dict], route_id: ObjectId, journey_date: str,
+                            errors: List[str]) -> int:
+        """Async version of _store_buses"""
+        if not buses:
+            return 0
         
-        try:
-            price_match = re.search(r'(\d+\.?\d*)', str(price_str).replace(',', ''))
-            if price_match:
-                return float(price_match.group(1))
-        except (ValueError, AttributeError):
-            pass
+        operator_ids = await self.db.ainsert_operators_bulk(self._collect_operators(buses))
+        
+        services = self._build_services(buses, route_id, operator_ids)
+        service_ids = await self.db.ainsert_services_bulk([service for service, _ in services])
         
-        return None
+        fare_records = self._build_fare_records(services, service_ids, journey_date)
+        fares_stored = sum(1 for fare_id in await self.db.ainsert_fare_data_bulk(fare_records) if fare_id)
+        if fares_stored:
+            await self.db.aincrement_route_fare_count(route_id, fares_stored)
+        
+        services_stored = sum(1 for service_id in service_ids if service_id)
+        self._report_store_failures(errors, len(buses), services_stored, len(fare_records), fares_stored)
+        return services_stored
+    
+    def _report_store_failures(self, errors: List[str], buses: int, services_stored: int,
+                               fares_built: int, fares_stored: int):
+        if services_stored < buses:
+            errors.append(f"Stored {services_stored} of {buses} bus services")
+        if fares_stored < fares_built:
+            errors.append(f"Stored {fares_stored} of {fares_built} fare records")
     
-    def _extract_seats_count(self, seats_str: str) -> Optional[int]:
-        """Extract numeric seats count from seats string"""
-        if not seats_str or seats_str == 'N/A':
-            return None
+    def _collect_operators(self, buses: List[Dict]) -> Dict[str, Optional[float]]:
+        """Map each operator name to the rating of its first bus"""
+        operators = {}
+        for bus_data in buses:
+            operator_name = bus_data.get('operator_name', 'Unknown')
+            if operator_name not in operators:
+                operators[operator_name] = extract_rating(bus_data.get('rating'))
+        return operators
+    
+    def _build_services(self, buses: List[Dict], route_id: ObjectId,
+                        operator_ids: Dict[str, ObjectId]) -> List[Tuple[Dict, Dict]]:
+        """Build a bus_services document for every bus whose operator is known"""
+        services = []
+        for bus_data in buses:
+            operator_id = operator_ids.get(bus_data.get('operator_name', 'Unknown'))
+            if not operator_id:
+                continue
+            
+            services.append(({
+                "route_id": route_id,
+                "operator_id": operator_id,
+                "bus_type": bus_data.get('bus_type', 'Unknown'),
+                "departure_time": bus_data.get('departure_time', ''),
+                "arrival_time": bus_data.get('arrival_time', ''),
+                "duration": bus_data.get('duration', ''),
+                "rating": extract_rating(bus_data.get('rating'))
+            }, bus_data))
         
-        try:
-            seats_match = re.search(r'(\d+)', str(seats_str))
-            if seats_match:
-                return int(seats_match.group(1))
-        except (ValueError, AttributeError):
-            pass
+        return services
+    
+    def _build_fare_records(self, services: List[Tuple[Dict, Dict]], service_ids: List[Optional[ObjectId]],
+                            journey_date: str) -> List[Dict]:
+        """Build fare records for every service that was stored"""
+        return [
+            fare_record
+            for (_, bus_data), service_id in zip(services, service_ids) if service_id
+            for fare_record in self._build_fare_docs(bus_data, service_id, journey_date)
+        ]
+    
+    def _build_fare_docs(self, bus_data: Dict, service_id: ObjectId, journey_date: str) -> List[Dict]:
+        """Build the fare_data records for a single bus"""
+        fare_docs = []
+        starting_price = extract_price(bus_data.get('starting_price'))
+        
+        detailed_fares = bus_data.get('detailed_fares', [])
+        if detailed_fares:
+            for fare_detail in detailed_fares:
+                fare_amount = extract_price(fare_detail.get('fare'))
+                available_seats = extract_seats_count(fare_detail.get('available_seats'))
+                
+                if fare_amount and fare_amount > 0:
+                    fare_docs.append({
+                        "service_id": service_id,
+                        "journey_date": journey_date,
+                        "seat_category": fare_detail.get('seat_category', 'Unknown'),
+                        "fare": fare_amount,
+                        "available_seats": available_seats or 0,
+                        "starting_price": starting_price
+                    })
+        else:
+            if starting_price and starting_price > 0:
+                seats_available = extract_seats_count(bus_data.get('seats_available'))
+                fare_docs.append({
+                    "service_id": service_id,
+                    "journey_date": journey_date,
+                    "seat_category": 'Standard',
+                    "fare": starting_price,
+                    "available_seats": seats_available or 0,
+                    "starting_price": starting_price
+                })
         
-        return None
+        return fare_docs
     
     def get_route_analytics(self, source: str, destination: str, days_back: int = 30) -> Dict:
-        """Get analytics for a specific route"""
+        """Get analytics for a specific route, served from cache for up to _ANALYTICS_TTL seconds"""
+        cache_key = (source, destination, days_back)
+        if cache_key in _ANALYTICS_CACHE:
+            return _ANALYTICS_CACHE[cache_key]
+        
         try:
-            fare_history = self.db.get_route_fare_history(source, destination, days_back)
-            demand_analysis = self.db.get_demand_analysis(source, destination)
+            # Raises on database errors, so a failed query is never cached as empty analytics
+            fare_history, demand_analysis = self.db.get_route_analytics_data(source, destination, days_back)
             
-            analytics = {
-                'route': f"{source} to {destination}",
-                'total_records': len(fare_history),
-                'demand_analysis': demand_analysis,
-                'recent_fares': fare_history[:10],
-                'price_trends': self._calculate_price_trends(fare_history)
-            }
+            analytics = self._build_route_analytics(source, destination, fare_history, demand_analysis)
+            
+            _ANALYTICS_CACHE[cache_key] = analytics
+            return analytics
+            
+        except Exception as e:
+            self.logger.error(f"Error getting route analytics: {str(e)}")
+            return {}
+    
+    async def aget_route_analytics(self, source: str, destination: str, days_back: int = 30) -> Dict:
+        """Async version of get_route_analytics, running both route queries concurrently"""
+        cache_key = (source, destination, days_back)
+        if cache_key in _ANALYTICS_CACHE:
+            return _ANALYTICS_CACHE[cache_key]
+        
+        try:
+            fare_history, demand_analysis = await self.db.aget_route_analytics_data(source, destination, days_back)
+            
+            analytics = self._build_route_analytics(source, destination, fare_history, demand_analysis)
             
+            _ANALYTICS_CACHE[cache_key] = analytics
             return analytics
             
         except Exception as e:
             self.logger.error(f"Error getting route analytics: {str(e)}")
             return {}
     
+    def _build_route_analytics(self, source: str, destination: str, fare_history: List[Dict],
+                               demand_analysis: Dict) -> Dict:
+        return {
+            'route': f"{source} to {destination}",
+            'total_records': len(fare_history),
+            'demand_analysis': demand_analysis,
+            'recent_fares': fare_history[:10],
+            'price_trends': self._calculate_price_trends(fare_history)
+        }
+    
     def _calculate_price_trends(self, fare_history: List[Dict]) -> Dict:
         """Calculate price trends from fare history"""
         if not fare_history:
             return {}
         
         try:
-            fares_by_date = {}
-            for record in fare_history:
-                date = record['journey_date']
-                fare = record['fare']
-                
-                if date not in fares_by_date:
-                    fares_by_date[date] = []
-                fares_by_date[date].append(fare)
+            dates = np.array([record['journey_date'] for record in fare_history])
+            fares = np.fromiter((record['fare'] for record in fare_history),
+                                dtype=np.float64, count=len(fare_history))
             
-            avg_fares_by_date = {
-                date: sum(fares) / len(fares)
-                for date, fares in fares_by_date.items()
-            }
+            # np.unique returns the dates sorted, so the per-date means come out in date order
+            sorted_dates, inverse = np.unique(dates, return_inverse=True)
+            avg_fares = np.bincount(inverse, weights=fares) / np.bincount(inverse)
             
-            sorted_dates = sorted(avg_fares_by_date.keys())
+            sorted_dates = sorted_dates.tolist()
+            avg_fares_by_date = dict(zip(sorted_dates, avg_fares.tolist()))
             
             if len(sorted_dates) >= 2:
                 recent_avg = avg_fares_by_date[sorted_dates[-1]]
@@ -239,10 +348,11 @@ class DataManager:
             self.logger.error(f"Error calculating price trends: {str(e)}")
             return {}
     
-    def export_route_data(self, source: str, destination: str, output_path: str) -> int:
-        """Export route data to CSV"""
+    def export_route_data(self, source: str, destination: str, output_path: str,
+                          format: str = "csv") -> int:
+        """Export route data to CSV or Parquet"""
         try:
-            return self.db.export_data_to_csv(output_path, source, destination)
+            return self.db.export_data_to_csv(output_path, source, destination, format)
         except Exception as e:
             self.logger.error(f"Error exporting data: {str(e)}")
             return 0
@@ -250,47 +360,54 @@ class DataManager:
     def get_all_routes(self) -> List[Dict]:
         """Get all routes in the database"""
         try:
-            pipeline = [
-                {
-                    "$lookup": {
-                        "from": "bus_services",
-                        "localField": "_id",
-                        "foreignField": "route_id",
-                        "as": "services"
-                    }
-                },
-                {
-                    "$lookup": {
-                        "from": "fare_data",
-                        "localField": "services._id",
-                        "foreignField": "service_id",
-                        "as": "fares"
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": {
-                            "source": "$source",
-                            "destination": "$destination"
-                        },
-                        "total_records": {"$sum": {"$size": "$fares"}}
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 0,
-                        "source": "$_id.source",
-                        "destination": "$_id.destination",
-                        "total_records": 1
-                    }
-                },
+            routes = self.db.db.routes.find(
+                {}, {"_id": 0, "source": 1, "destination": 1, "fare_count": 1}
+            ).sort("fare_count", -1)
+            
+            return [
                 {
-                    "$sort": {"total_records": -1}
+                    'source': route['source'],
+                    'destination': route['destination'],
+                    'total_records': route.get('fare_count', 0)
                 }
+                for route in routes
             ]
-            
-            return list(self.db.db.routes.aggregate(pipeline))
                 
         except Exception as e:
             self.logger.error(f"Error getting all routes: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def _backfill_fare_counts(self):
+        """Set fare_count on routes stored before the counter was maintained on insert"""
+        pipeline = [
+            {"$match": {"fare_count": {"$exists": False}}},
+            {
+                "$lookup": {
+                    "from": "bus_services",
+                    "localField": "_id",
+                    "foreignField": "route_id",
+                    "as": "services"
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "fare_data",
+                    "localField": "services._id",
+                    "foreignField": "service_id",
+                    "as": "fares"
+                }
+            },
+            {"$project": {"fare_count": {"$size": "$fares"}}}
+        ]
+        
+        for route in self.db.db.routes.aggregate(pipeline):
+            self.db.db.routes.update_one(
+                {"_id": route["_id"], "fare_count": {"$exists": False}},
+                {"$set": {"fare_count": route["fare_count"]}}
+            )
+
+@functools.lru_cache(maxsize=None)
+def get_data_manager(connection_string: str = "mongodb://localhost:27017",
+                     db_name: str = "redbus_fares") -> DataManager:
+    """Shared DataManager per connection, so its MongoDB connection pool is reused"""
+    return DataManager(connection_string, db_name)
@@ -1,13 +1,41 @@
+import atexit
 import json
+import logging
+import sys
 import asyncio
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import List, Dict, Literal, Optional, Any, Set, Tuple
 from dataclasses import dataclass, asdict
 from bson import ObjectId
-from pymongo import MongoClient
-from motor.motor_asyncio import AsyncIOMotorClient
+from cachetools import LRUCache
+from pymongo import InsertOne, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# Documents per bulk_write call; large batches amortize round trips without
+# building oversized commands
+BULK_BATCH_SIZE = 1000
+# Documents fetched and written per CSV export chunk
+EXPORT_CHUNK_SIZE = 5000
+# Column order of CSV exports, matching the Parquet export schema
+EXPORT_COLUMNS = [
+    "_id", "source", "destination", "operator_name", "bus_type", "departure_time",
+    "arrival_time", "duration", "journey_date", "seat_category", "fare",
+    "available_seats", "scraped_at",
+]
+# Upper bound on remembered route/operator ids per manager
+ID_CACHE_SIZE = 4096
+# fare_data index every service_id-filtered pipeline is hinted to, so the planner
+# can't fall back to a collection scan when it misjudges the $in cardinality
+FARE_SERVICE_INDEX = [("service_id", 1), ("scraped_at", -1), ("journey_date", -1)]
+# Server-side time limit for the analytics aggregations, which a user waits on
+ANALYTICS_MAX_TIME_MS = 30_000
+# Slotted dataclasses skip the per-instance __dict__; slots= only exists on Python 3.10+
+_DATACLASS_OPTIONS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class Route:
     _id: Optional[ObjectId]
     source: str
@@ -15,14 +43,14 @@ class Route:
     distance_km: Optional[float] = None
     created_at: Optional[datetime] = None
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class BusOperator:
     _id: Optional[ObjectId]
     name: str
     rating: Optional[float] = None
     created_at: Optional[datetime] = None
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class BusService:
     _id: Optional[ObjectId]
     route_id: ObjectId
@@ -34,7 +62,7 @@ class BusService:
     rating: Optional[float] = None
     created_at: Optional[datetime] = None
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class FareData:
     _id: Optional[ObjectId]
     service_id: ObjectId
@@ -46,7 +74,7 @@ class FareData:
     scraped_at: Optional[datetime] = None
     demand_factor: Optional[float] = None
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ScrapingSession:
     _id: Optional[ObjectId]
     route_id: ObjectId
@@ -57,63 +85,145 @@ class ScrapingSession:
     session_end: Optional[datetime] = None
     status: str = 'active'
 
+# Shared by the sync and Motor clients so both are tuned the same way
+_CLIENT_OPTIONS: Dict[str, Any] = {
+    # Enough for --max-concurrency scrapers plus export/analytics queries without queueing
+    "maxPoolSize": 50,
+    # Keep a few warm connections so the first writes of a run skip the TCP/TLS handshake
+    "minPoolSize": 5,
+    # Drop connections idle for a minute instead of holding server resources between runs
+    "maxIdleTimeMS": 60_000,
+    # Fail fast when MongoDB is down instead of the 30s default hanging every scraper
+    "serverSelectionTimeoutMS": 5_000,
+    # No socketTimeoutMS: exports and the fare_count backfill run a blocking $sort/$lookup
+    # pipeline before their first batch, so a client-wide read timeout would abort large ones.
+    # Interactive queries are bounded with maxTimeMS instead (ANALYTICS_MAX_TIME_MS)
+    # Let the driver retry a write once on a transient network error or failover
+    "retryWrites": True,
+    # Fare rows are re-scraped anyway, so acknowledgement from the primary is enough
+    "w": 1,
+    # fare_data is long runs of repetitive strings; zlib is the fallback for servers without zstd
+    "compressors": "zstd,zlib",
+}
+
+_CLIENTS: Dict[str, MongoClient] = {}
+
+def _get_client(connection_string: str) -> MongoClient:
+    """Process-wide MongoClient per connection string, so its pool and handshake are reused"""
+    client = _CLIENTS.get(connection_string)
+    if client is None:
+        client = MongoClient(connection_string, **_CLIENT_OPTIONS)
+        _CLIENTS[connection_string] = client
+    return client
+
+@atexit.register
+def _close_clients():
+    for client in _CLIENTS.values():
+        client.close()
+    _CLIENTS.clear()
+
 class DatabaseManager:
+    # (connection_string, db_name) pairs whose indexes were already ensured in this process
+    _indexes_created: Set[Tuple[str, str]] = set()
+    
     def __init__(self, connection_string: str = "mongodb://localhost:27017", db_name: str = "redbus_fares"):
         self.connection_string = connection_string
         self.db_name = db_name
         self.client = None
         self.db = None
+        self.async_client = None
+        self._async_db = None
+        # Routes and operators are never deleted, so their ids can be remembered instead of
+        # being looked up again for every scrape; bounded so long runs don't grow without limit
+        self._route_ids: LRUCache = LRUCache(maxsize=ID_CACHE_SIZE)
+        self._operator_ids: LRUCache = LRUCache(maxsize=ID_CACHE_SIZE)
         self.init_database()
     
     def init_database(self):
         """Initialize MongoDB connection and create indexes"""
-        self.client = MongoClient(self.connection_string)
+        self.client = _get_client(self.connection_string)
         self.db = self.client[self.db_name]
         
+        index_key = (self.connection_string, self.db_name)
+        if index_key in DatabaseManager._indexes_created:
+            return
+        
         # Create indexes for better performance
         self.db.routes.create_index([("source", 1), ("destination", 1)], unique=True)
         self.db.bus_operators.create_index("name", unique=True)
         self.db.fare_data.create_index("journey_date")
-        self.db.fare_data.create_index("service_id")
-        self.db.scraping_sessions.create_index("route_id")
+        # Equality on service_id, then sort/range on scraped_at and journey_date (ESR order)
+        self.db.fare_data.create_index(FARE_SERVICE_INDEX)
+        self.db.bus_services.create_index([("route_id", 1), ("operator_id", 1)])
+        # Also serves route_id-only lookups, so no separate single-field index is needed
+        self.db.scraping_sessions.create_index([("route_id", 1), ("journey_date", -1)])
+        # Only live sessions are indexed, so this stays small as finished sessions pile up
+        self.db.scraping_sessions.create_index(
+            [("route_id", 1), ("session_start", -1)],
+            partialFilterExpression={"status": "active"}
+        )
+        
+        DatabaseManager._indexes_created.add(index_key)
+    
+    @property
+    def async_db(self):
+        """Motor database handle, created lazily so sync-only callers never open it"""
+        if self._async_db is None:
+            # Imported here so sync-only paths (export, listing) never load motor
+            from motor.motor_asyncio import AsyncIOMotorClient
+            
+            self.async_client = AsyncIOMotorClient(self.connection_string, **_CLIENT_OPTIONS)
+            self._async_db = self.async_client[self.db_name]
+        return self._async_db
     
     def get_collection(self, collection_name: str):
         """Get a MongoDB collection"""
         return self.db[collection_name]
     
     def close_connection(self):
-        """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
+        """Close this manager's Motor client; the shared sync client is closed at interpreter exit"""
+        self._route_ids.clear()
+        self._operator_ids.clear()
+        if self.async_client:
+            self.async_client.close()
+            self.async_client = None
+            self._async_db = None
     
     def insert_route(self, source: str, destination: str, distance_km: float = None) -> ObjectId:
         """Insert or get existing route"""
+        key = (source, destination)
+        if key in self._route_ids:
+            return self._route_ids[key]
+        
         try:
             route_data = {
                 "source": source,
                 "destination": destination,
                 "distance_km": distance_km,
+                "fare_count": 0,
                 "created_at": datetime.utcnow()
             }
             
-            result = self.db.routes.update_one(
+            route = self.db.routes.find_one_and_update(
                 {"source": source, "destination": destination},
                 {"$setOnInsert": route_data},
-                upsert=True
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.upserted_id:
-                return result.upserted_id
-            else:
-                existing_route = self.db.routes.find_one({"source": source, "destination": destination})
-                return existing_route["_id"]
+            self._route_ids[key] = route["_id"]
+            return route["_id"]
                 
-        except Exception as e:
-            print(f"Error inserting route: {e}")
+        except PyMongoError:
+            logger.exception("Error inserting route")
             return None
     
     def insert_operator(self, name: str, rating: float = None) -> ObjectId:
         """Insert or get existing operator"""
+        if name in self._operator_ids:
+            return self._operator_ids[name]
+        
         try:
             operator_data = {
                 "name": name,
@@ -121,20 +231,19 @@ class DatabaseManager:
                 "created_at": datetime.utcnow()
             }
             
-            result = self.db.bus_operators.update_one(
+            operator = self.db.bus_operators.find_one_and_update(
                 {"name": name},
                 {"$setOnInsert": operator_data},
-                upsert=True
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.upserted_id:
-                return result.upserted_id
-            else:
-                existing_operator = self.db.bus_operators.find_one({"name": name})
-                return existing_operator["_id"]
+            self._operator_ids[name] = operator["_id"]
+            return operator["_id"]
                 
-        except Exception as e:
-            print(f"Error inserting operator: {e}")
+        except PyMongoError:
+            logger.exception("Error inserting operator")
             return None
     
     def insert_service(self, route_id: ObjectId, operator_id: ObjectId, bus_type: str,
@@ -156,8 +265,8 @@ class DatabaseManager:
             result = self.db.bus_services.insert_one(service_data)
             return result.inserted_id
             
-        except Exception as e:
-            print(f"Error inserting service: {e}")
+        except PyMongoError:
+            logger.exception("Error inserting service")
             return None
     
     def insert_fare_data(self, service_id: ObjectId, journey_date: str, seat_category: str,
@@ -177,10 +286,84 @@ class DatabaseManager:
             result = self.db.fare_data.insert_one(fare_data)
             return result.inserted_id
             
-        except Exception as e:
-            print(f"Error inserting fare data: {e}")
+        except PyMongoError:
+            logger.exception("Error inserting fare data")
             return None
     
+    def insert_operators_bulk(self, operators: Dict[str, Optional[float]]) -> Dict[str, ObjectId]:
+        """Upsert operators given as {name: rating} and return {name: _id}"""
+        try:
+            new_operators = {name: rating for name, rating in operators.items() if name not in self._operator_ids}
+            if new_operators:
+                self._bulk_write(self.db.bus_operators, self._operator_upserts(new_operators))
+                
+                cursor = self.db.bus_operators.find({"name": {"$in": list(new_operators)}}, {"_id": 1, "name": 1})
+                self._operator_ids.update((doc["name"], doc["_id"]) for doc in cursor)
+            
+            return {name: self._operator_ids[name] for name in operators if name in self._operator_ids}
+            
+        except PyMongoError:
+            logger.exception("Error inserting operators")
+            return {}
+    
+    def insert_services_bulk(self, services: List[Dict]) -> List[Optional[ObjectId]]:
+        """Insert bus services, returning their ids in input order (None where the insert failed)"""
+        docs = self._with_ids(services, "created_at")
+        failed = self._bulk_write(self.db.bus_services, [InsertOne(doc) for doc in docs])
+        return [None if i in failed else doc["_id"] for i, doc in enumerate(docs)]
+    
+    def insert_fare_data_bulk(self, records: List[Dict]) -> List[Optional[ObjectId]]:
+        """Insert fare records, returning their ids in input order (None where the insert failed)"""
+        docs = self._with_ids(records, "scraped_at")
+        failed = self._bulk_write(self.db.fare_data, [InsertOne(doc) for doc in docs])
+        return [None if i in failed else doc["_id"] for i, doc in enumerate(docs)]
+    
+    def increment_route_fare_count(self, route_id: ObjectId, count: int):
+        """Add newly stored fares to the route's fare_count"""
+        try:
+            self.db.routes.update_one({"_id": route_id}, {"$inc": {"fare_count": count}})
+        except PyMongoError:
+            logger.exception("Error updating route fare count")
+    
+    def _operator_upserts(self, operators: Dict[str, Optional[float]]) -> List[UpdateOne]:
+        created_at = datetime.utcnow()
+        return [
+            UpdateOne(
+                {"name": name},
+                {"$setOnInsert": {"name": name, "rating": rating, "created_at": created_at}},
+                upsert=True
+            )
+            for name, rating in operators.items()
+        ]
+    
+    def _with_ids(self, records: List[Dict], timestamp_field: str) -> List[Dict]:
+        """Copy records, assigning _id client-side and one shared timestamp for the whole batch"""
+        timestamp = datetime.utcnow()
+        return [{**record, "_id": ObjectId(), timestamp_field: timestamp} for record in records]
+    
+    def _bulk_write(self, collection, ops: List) -> Set[int]:
+        """Run unordered bulk writes in BULK_BATCH_SIZE chunks and return the indexes of failed ops"""
+        failed = set()
+        batch_error = None
+        for start in range(0, len(ops), BULK_BATCH_SIZE):
+            batch = ops[start:start + BULK_BATCH_SIZE]
+            try:
+                collection.bulk_write(batch, ordered=False)
+            except BulkWriteError as e:
+                failed.update(start + error["index"] for error in e.details.get("writeErrors", []))
+            except PyMongoError as e:
+                failed.update(range(start, start + len(batch)))
+                batch_error = batch_error or e
+        
+        self._log_bulk_failures(collection, failed, len(ops), batch_error)
+        return failed
+    
+    def _log_bulk_failures(self, collection, failed: Set[int], total: int, error: Optional[Exception]):
+        # One line per call rather than per batch, so an outage doesn't flood the log
+        if failed:
+            logger.warning("Bulk write to %s: %d of %d operations failed",
+                           collection.name, len(failed), total, exc_info=error)
+    
     def start_scraping_session(self, route_id: ObjectId, journey_date: str) -> ObjectId:
         """Start a new scraping session"""
         try:
@@ -196,8 +379,8 @@ class DatabaseManager:
             result = self.db.scraping_sessions.insert_one(session_data)
             return result.inserted_id
             
-        except Exception as e:
-            print(f"Error starting scraping session: {e}")
+        except PyMongoError:
+            logger.exception("Error starting scraping session")
             return None
     
     def update_scraping_session(self, session_id: ObjectId, total_buses: int = None,
@@ -224,144 +407,360 @@ class DatabaseManager:
                     {"$set": update_data}
                 )
                 
-        except Exception as e:
-            print(f"Error updating scraping session: {e}")
+        except PyMongoError:
+            logger.exception("Error updating scraping session")
+    
+    async def ainsert_route(self, source: str, destination: str, distance_km: float = None) -> ObjectId:
+        """Async version of insert_route"""
+        key = (source, destination)
+        if key in self._route_ids:
+            return self._route_ids[key]
+        
+        try:
+            route_data = {
+                "source": source,
+                "destination": destination,
+                "distance_km": distance_km,
+                "fare_count": 0,
+                "created_at": datetime.utcnow()
+            }
+            
+            route = await self.async_db.routes.find_one_and_update(
+                {"source": source, "destination": destination},
+                {"$setOnInsert": route_data},
+                projection={"_id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            
+            self._route_ids[key] = route["_id"]
+            return route["_id"]
+                
+        except PyMongoError:
+            logger.exception("Error inserting route")
+            return None
+    
+    async def astart_scraping_session(self, route_id: ObjectId, journey_date: str) -> ObjectId:
+        """Async version of start_scraping_session"""
+        try:
+            session_data = {
+                "route_id": route_id,
+                "journey_date": journey_date,
+                "total_buses_found": 0,
+                "successful_scrapes": 0,
+                "session_start": datetime.utcnow(),
+                "status": "active"
+            }
+            
+            result = await self.async_db.scraping_sessions.insert_one(session_data)
+            return result.inserted_id
+            
+        except PyMongoError:
+            logger.exception("Error starting scraping session")
+            return None
+    
+    async def aupdate_scraping_session(self, session_id: ObjectId, total_buses: int = None,
+                                       successful_scrapes: int = None, status: str = None):
+        """Async version of update_scraping_session"""
+        try:
+            update_data = {}
+            
+            if total_buses is not None:
+                update_data["total_buses_found"] = total_buses
+            
+            if successful_scrapes is not None:
+                update_data["successful_scrapes"] = successful_scrapes
+            
+            if status is not None:
+                update_data["status"] = status
+                
+                if status == 'completed':
+                    update_data["session_end"] = datetime.utcnow()
+            
+            if update_data:
+                await self.async_db.scraping_sessions.update_one(
+                    {"_id": session_id},
+                    {"$set": update_data}
+                )
+                
+        except PyMongoError:
+            logger.exception("Error updating scraping session")
+    
+    async def ainsert_operators_bulk(self, operators: Dict[str, Optional[float]]) -> Dict[str, ObjectId]:
+        """Async version of insert_operators_bulk"""
+        try:
+            new_operators = {name: rating for name, rating in operators.items() if name not in self._operator_ids}
+            if new_operators:
+                await self._abulk_write(self.async_db.bus_operators, self._operator_upserts(new_operators))
+                
+                cursor = self.async_db.bus_operators.find({"name": {"$in": list(new_operators)}}, {"_id": 1, "name": 1})
+                async for doc in cursor:
+                    self._operator_ids[doc["name"]] = doc["_id"]
+            
+            return {name: self._operator_ids[name] for name in operators if name in self._operator_ids}
+            
+        except PyMongoError:
+            logger.exception("Error inserting operators")
+            return {}
+    
+    async def ainsert_services_bulk(self, services: List[Dict]) -> List[Optional[ObjectId]]:
+        """Async version of insert_services_bulk"""
+        docs = self._with_ids(services, "created_at")
+        failed = await self._abulk_write(self.async_db.bus_services, [InsertOne(doc) for doc in docs])
+        return [None if i in failed else doc["_id"] for i, doc in enumerate(docs)]
+    
+    async def ainsert_fare_data_bulk(self, records: List[Dict], concurrency: int = 4) -> List[Optional[ObjectId]]:
+        """Async version of insert_fare_data_bulk, keeping up to `concurrency` batches in flight"""
+        docs = self._with_ids(records, "scraped_at")
+        collection = self.async_db.fare_data
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def insert_batch(start: int) -> Tuple[Set[int], Optional[Exception]]:
+            async with semaphore:
+                batch = [InsertOne(doc) for doc in docs[start:start + BULK_BATCH_SIZE]]
+                failed, batch_error = await self._abulk_write_batches(collection, batch)
+                return {start + i for i in failed}, batch_error
+        
+        batch_results = await asyncio.gather(
+            *(insert_batch(start) for start in range(0, len(docs), BULK_BATCH_SIZE))
+        )
+        failed = set().union(*(batch_failed for batch_failed, _ in batch_results))
+        batch_error = next((error for _, error in batch_results if error), None)
+        self._log_bulk_failures(collection, failed, len(docs), batch_error)
+        return [None if i in failed else doc["_id"] for i, doc in enumerate(docs)]
+    
+    async def aincrement_route_fare_count(self, route_id: ObjectId, count: int):
+        """Async version of increment_route_fare_count"""
+        try:
+            await self.async_db.routes.update_one({"_id": route_id}, {"$inc": {"fare_count": count}})
+        except PyMongoError:
+            logger.exception("Error updating route fare count")
+    
+    async def _abulk_write(self, collection, ops: List) -> Set[int]:
+        """Async version of _bulk_write"""
+        failed, batch_error = await self._abulk_write_batches(collection, ops)
+        self._log_bulk_failures(collection, failed, len(ops), batch_error)
+        return failed
+    
+    async def _abulk_write_batches(self, collection, ops: List) -> Tuple[Set[int], Optional[Exception]]:
+        """_abulk_write without the logging: failed op indexes and the first non-write error"""
+        failed = set()
+        batch_error = None
+        for start in range(0, len(ops), BULK_BATCH_SIZE):
+            batch = ops[start:start + BULK_BATCH_SIZE]
+            try:
+                await collection.bulk_write(batch, ordered=False)
+            except BulkWriteError as e:
+                failed.update(start + error["index"] for error in e.details.get("writeErrors", []))
+            except PyMongoError as e:
+                failed.update(range(start, start + len(batch)))
+                batch_error = batch_error or e
+        return failed, batch_error
+    
+    def _route_service_ids(self, source: str, destination: str) -> List[ObjectId]:
+        """Resolve a route to its bus_services ids, so aggregations can start on an indexed $match"""
+        route = self.db.routes.find_one({"source": source, "destination": destination}, {"_id": 1})
+        if not route:
+            return []
+        return [doc["_id"] for doc in self.db.bus_services.find({"route_id": route["_id"]}, {"_id": 1})]
+    
+    async def _aroute_service_ids(self, source: str, destination: str) -> List[ObjectId]:
+        """Async version of _route_service_ids"""
+        route = await self.async_db.routes.find_one({"source": source, "destination": destination}, {"_id": 1})
+        if not route:
+            return []
+        cursor = self.async_db.bus_services.find({"route_id": route["_id"]}, {"_id": 1})
+        return [doc["_id"] async for doc in cursor]
+    
+    def _fare_history_pipeline(self, service_ids: List[ObjectId], days_back: int) -> List[Dict]:
+        """Aggregation pipeline behind get_route_fare_history"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+        
+        return [
+            {
+                "$match": {
+                    "service_id": {"$in": service_ids},
+                    "scraped_at": {"$gte": cutoff_date}
+                }
+            },
+            {
+                "$project": {
+                    "service_id": 1,
+                    "journey_date": 1,
+                    "seat_category": 1,
+                    "fare": 1,
+                    "available_seats": 1,
+                    "scraped_at": 1
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "bus_services",
+                    "let": {"sid": "$service_id"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$_id", "$$sid"]}}},
+                        {"$project": {"_id": 0, "operator_id": 1, "bus_type": 1}}
+                    ],
+                    "as": "service"
+                }
+            },
+            {"$unwind": "$service"},
+            {
+                "$lookup": {
+                    "from": "bus_operators",
+                    "let": {"oid": "$service.operator_id"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$_id", "$$oid"]}}},
+                        {"$project": {"_id": 0, "name": 1}}
+                    ],
+                    "as": "operator"
+                }
+            },
+            {"$unwind": "$operator"},
+            {
+                "$sort": {"journey_date": -1, "fare": 1}
+            },
+            {
+                "$project": {
+                    "journey_date": 1,
+                    "operator_name": "$operator.name",
+                    "bus_type": "$service.bus_type",
+                    "seat_category": 1,
+                    "fare": 1,
+                    "available_seats": 1,
+                    "scraped_at": 1
+                }
+            }
+        ]
+    
+    def _fare_history(self, service_ids: List[ObjectId], days_back: int) -> List[Dict]:
+        pipeline = self._fare_history_pipeline(service_ids, days_back)
+        return list(self.db.fare_data.aggregate(
+            pipeline, allowDiskUse=True, hint=FARE_SERVICE_INDEX, maxTimeMS=ANALYTICS_MAX_TIME_MS
+        ))
+    
+    async def _afare_history(self, service_ids: List[ObjectId], days_back: int) -> List[Dict]:
+        pipeline = self._fare_history_pipeline(service_ids, days_back)
+        return await self.async_db.fare_data.aggregate(
+            pipeline, allowDiskUse=True, hint=FARE_SERVICE_INDEX, maxTimeMS=ANALYTICS_MAX_TIME_MS
+        ).to_list(length=None)
     
     def get_route_fare_history(self, source: str, destination: str, 
                               days_back: int = 30) -> List[Dict]:
         """Get fare history for a route"""
         try:
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+            service_ids = self._route_service_ids(source, destination)
+            if not service_ids:
+                return []
             
-            pipeline = [
-                {
-                    "$lookup": {
-                        "from": "bus_services",
-                        "localField": "service_id",
-                        "foreignField": "_id",
-                        "as": "service"
-                    }
-                },
-                {"$unwind": "$service"},
-                {
-                    "$lookup": {
-                        "from": "routes",
-                        "localField": "service.route_id",
-                        "foreignField": "_id",
-                        "as": "route"
-                    }
-                },
-                {"$unwind": "$route"},
-                {
-                    "$lookup": {
-                        "from": "bus_operators",
-                        "localField": "service.operator_id",
-                        "foreignField": "_id",
-                        "as": "operator"
-                    }
-                },
-                {"$unwind": "$operator"},
-                {
-                    "$match": {
-                        "route.source": source,
-                        "route.destination": destination,
-                        "scraped_at": {"$gte": cutoff_date}
-                    }
-                },
-                {
-                    "$sort": {"journey_date": -1, "fare": 1}
-                },
-                {
-                    "$project": {
-                        "journey_date": 1,
-                        "operator_name": "$operator.name",
-                        "bus_type": "$service.bus_type",
-                        "seat_category": 1,
-                        "fare": 1,
-                        "available_seats": 1,
-                        "scraped_at": 1
-                    }
-                }
-            ]
-            
-            return list(self.db.fare_data.aggregate(pipeline))
+            return self._fare_history(service_ids, days_back)
             
-        except Exception as e:
-            print(f"Error getting route fare history: {e}")
+        except PyMongoError:
+            logger.exception("Error getting route fare history")
             return []
     
+    def _demand_analysis_pipeline(self, service_ids: List[ObjectId]) -> List[Dict]:
+        """Aggregation pipeline behind get_demand_analysis"""
+        cutoff_date = datetime.utcnow() - timedelta(days=30)
+        
+        return [
+            {
+                "$match": {
+                    "service_id": {"$in": service_ids},
+                    "scraped_at": {"$gte": cutoff_date}
+                }
+            },
+            {"$project": {"_id": 0, "fare": 1, "available_seats": 1}},
+            {
+                "$group": {
+                    "_id": None,
+                    "avg_fare": {"$avg": "$fare"},
+                    "min_fare": {"$min": "$fare"},
+                    "max_fare": {"$max": "$fare"},
+                    "avg_available_seats": {"$avg": "$available_seats"},
+                    "total_records": {"$sum": 1}
+                }
+            }
+        ]
+    
+    def _demand_analysis(self, service_ids: List[ObjectId]) -> Dict:
+        pipeline = self._demand_analysis_pipeline(service_ids)
+        result = list(self.db.fare_data.aggregate(
+            pipeline, allowDiskUse=True, hint=FARE_SERVICE_INDEX, maxTimeMS=ANALYTICS_MAX_TIME_MS
+        ))
+        return self._demand_result(result)
+    
+    async def _ademand_analysis(self, service_ids: List[ObjectId]) -> Dict:
+        pipeline = self._demand_analysis_pipeline(service_ids)
+        result = await self.async_db.fare_data.aggregate(
+            pipeline, allowDiskUse=True, hint=FARE_SERVICE_INDEX, maxTimeMS=ANALYTICS_MAX_TIME_MS
+        ).to_list(length=None)
+        return self._demand_result(result)
+    
+    def _demand_result(self, result: List[Dict]) -> Dict:
+        if result:
+            data = result[0]
+            data.pop("_id", None)
+            return data
+        return {}
+    
     def get_demand_analysis(self, source: str, destination: str) -> Dict:
         """Get demand analysis for a route"""
         try:
-            from datetime import timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
+            service_ids = self._route_service_ids(source, destination)
+            if not service_ids:
+                return {}
             
-            pipeline = [
-                {
-                    "$lookup": {
-                        "from": "bus_services",
-                        "localField": "service_id",
-                        "foreignField": "_id",
-                        "as": "service"
-                    }
-                },
-                {"$unwind": "$service"},
-                {
-                    "$lookup": {
-                        "from": "routes",
-                        "localField": "service.route_id",
-                        "foreignField": "_id",
-                        "as": "route"
-                    }
-                },
-                {"$unwind": "$route"},
-                {
-                    "$match": {
-                        "route.source": source,
-                        "route.destination": destination,
-                        "scraped_at": {"$gte": cutoff_date}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": None,
-                        "avg_fare": {"$avg": "$fare"},
-                        "min_fare": {"$min": "$fare"},
-                        "max_fare": {"$max": "$fare"},
-                        "avg_available_seats": {"$avg": "$available_seats"},
-                        "total_records": {"$sum": 1}
-                    }
-                }
-            ]
-            
-            result = list(self.db.fare_data.aggregate(pipeline))
-            if result:
-                data = result[0]
-                data.pop("_id", None)
-                return data
-            return {}
+            return self._demand_analysis(service_ids)
             
-        except Exception as e:
-            print(f"Error getting demand analysis: {e}")
+        except PyMongoError:
+            logger.exception("Error getting demand analysis")
             return {}
     
-    def export_data_to_csv(self, output_path: str, source: str = None, destination: str = None):
-        """Export data to CSV"""
+    def get_route_analytics_data(self, source: str, destination: str,
+                                 days_back: int = 30) -> Tuple[List[Dict], Dict]:
+        """Fare history and demand analysis for a route, resolving its services only once.
+
+        Database errors are raised rather than turned into empty results, so callers
+        can tell a failure from a quiet route.
+        """
+        service_ids = self._route_service_ids(source, destination)
+        if not service_ids:
+            return [], {}
+        
+        return self._fare_history(service_ids, days_back), self._demand_analysis(service_ids)
+    
+    async def aget_route_analytics_data(self, source: str, destination: str,
+                                        days_back: int = 30) -> Tuple[List[Dict], Dict]:
+        """Async version of get_route_analytics_data, running both aggregations concurrently"""
+        service_ids = await self._aroute_service_ids(source, destination)
+        if not service_ids:
+            return [], {}
+        
+        fare_history, demand_analysis = await asyncio.gather(
+            self._afare_history(service_ids, days_back),
+            self._ademand_analysis(service_ids)
+        )
+        return fare_history, demand_analysis
+    
+    def export_data_to_csv(self, output_path: str, source: str = None, destination: str = None,
+                           format: Literal["csv", "parquet"] = "csv"):
+        """Export data to CSV, or to zstd-compressed Parquet for format='parquet'"""
         try:
             import pandas as pd
             
-            match_conditions = {}
-            if source and destination:
-                match_conditions["route.source"] = source
-                match_conditions["route.destination"] = destination
-            
             pipeline = [
                 {
                     "$lookup": {
                         "from": "bus_services",
-                        "localField": "service_id",
-                        "foreignField": "_id",
+                        "let": {"sid": "$service_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$_id", "$$sid"]}}},
+                            {"$project": {
+                                "_id": 0, "route_id": 1, "operator_id": 1, "bus_type": 1,
+                                "departure_time": 1, "arrival_time": 1, "duration": 1
+                            }}
+                        ],
                         "as": "service"
                     }
                 },
@@ -369,8 +768,11 @@ class DatabaseManager:
                 {
                     "$lookup": {
                         "from": "routes",
-                        "localField": "service.route_id",
-                        "foreignField": "_id",
+                        "let": {"rid": "$service.route_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$_id", "$$rid"]}}},
+                            {"$project": {"_id": 0, "source": 1, "destination": 1}}
+                        ],
                         "as": "route"
                     }
                 },
@@ -378,8 +780,11 @@ class DatabaseManager:
                 {
                     "$lookup": {
                         "from": "bus_operators",
-                        "localField": "service.operator_id",
-                        "foreignField": "_id",
+                        "let": {"oid": "$service.operator_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$_id", "$$oid"]}}},
+                            {"$project": {"_id": 0, "name": 1}}
+                        ],
                         "as": "operator"
                     }
                 },
@@ -405,18 +810,66 @@ class DatabaseManager:
                 }
             ]
             
-            if match_conditions:
-                pipeline.insert(-1, {"$match": match_conditions})
+            options = {"allowDiskUse": True, "batchSize": EXPORT_CHUNK_SIZE}
+            if source and destination:
+                service_ids = self._route_service_ids(source, destination)
+                if not service_ids:
+                    return 0
+                pipeline.insert(0, {"$match": {"service_id": {"$in": service_ids}}})
+                # Only hint when filtering; an unfiltered export reads every document anyway
+                options["hint"] = FARE_SERVICE_INDEX
+            
+            cursor = self.db.fare_data.aggregate(pipeline, **options)
             
-            data = list(self.db.fare_data.aggregate(pipeline))
+            # Write chunk by chunk so memory stays bounded by EXPORT_CHUNK_SIZE, not the export size
+            chunks = iter(lambda: list(islice(cursor, EXPORT_CHUNK_SIZE)), [])
+            if format == "parquet":
+                return self._write_parquet_chunks(chunks, output_path)
             
-            if data:
-                df = pd.DataFrame(data)
-                df.to_csv(output_path, index=False)
-                return len(df)
-            else:
-                return 0
+            total_records = 0
+            for chunk in chunks:
+                # Fixed columns, so a chunk missing a field can't shift the ones after it
+                pd.DataFrame.from_records(chunk, columns=EXPORT_COLUMNS).to_csv(
+                    output_path,
+                    mode='w' if total_records == 0 else 'a',
+                    header=total_records == 0,
+                    index=False
+                )
+                total_records += len(chunk)
+            
+            return total_records
                 
-        except Exception as e:
-            print(f"Error exporting data to CSV: {e}")
-            return 0
\ No newline at end of file
+        except (PyMongoError, OSError):
+            logger.exception("Error exporting data")
+            return 0
+    
+    def _write_parquet_chunks(self, chunks, output_path: str) -> int:
+        """Stream export chunks into one Parquet file through a single ParquetWriter"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        # Fixed schema so every chunk lines up even when a field is missing from all its rows
+        schema = pa.schema([
+            ("_id", pa.string()),
+            ("source", pa.string()),
+            ("destination", pa.string()),
+            ("operator_name", pa.string()),
+            ("bus_type", pa.string()),
+            ("departure_time", pa.string()),
+            ("arrival_time", pa.string()),
+            ("duration", pa.string()),
+            ("journey_date", pa.string()),
+            ("seat_category", pa.string()),
+            ("fare", pa.float64()),
+            ("available_seats", pa.int64()),
+            ("scraped_at", pa.timestamp("ms")),
+        ])
+        
+        total_records = 0
+        with pq.ParquetWriter(output_path, schema, compression="zstd") as writer:
+            for chunk in chunks:
+                rows = [{**doc, "_id": str(doc["_id"])} for doc in chunk]
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                total_records += len(chunk)
+        
+        return total_records
@@ -1,254 +1,549 @@
 import asyncio
-import json
+import functools
+import inspect
 import logging
+import os
 import random
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from playwright.async_api import async_playwright, Page, Browser
-from fake_useragent import UserAgent
-import pandas as pd
+import traceback
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List, Dict, Optional, Tuple
+from playwright.async_api import async_playwright, Page, Browser, Playwright, Route
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from fake_useragent import FakeUserAgentError, UserAgent
+from aiolimiter import AsyncLimiter
+import diskcache
+import orjson
 
-class RedBusScraper:
-    def __init__(self, headless: bool = True):
+# Requests the scraper never reads from; aborting them cuts page weight and
+# lets load events fire sooner
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+BLOCKED_HOSTS = (
+    "googletagmanager.com", "google-analytics.com", "doubleclick.net",
+    "hotjar.com", "facebook.net",
+)
+
+SOURCE_INPUT_SELECTOR = 'input[id="src"]'
+DESTINATION_INPUT_SELECTOR = 'input[id="dest"]'
+DATE_INPUT_SELECTOR = 'input[id="onward_cal"]'
+SEARCH_BUTTON_SELECTOR = 'button[id="search_button"]'
+CITY_SUGGESTION_SELECTOR = 'ul[class*="sc-dnqmqq"] li:first-child'
+# Longest wait for a picked suggestion to land in its input; the search used to sleep 1-2s here
+CITY_PICK_TIMEOUT_MS = 2000
+# True once the input holds something other than what was typed (the picked city), or the
+# suggestion list has left the DOM; neither depends on stylesheets, which are blocked
+CITY_PICKED_JS = """([inputSelector, suggestionSelector, typed]) =>
+    document.querySelector(inputSelector)?.value !== typed || !document.querySelector(suggestionSelector)"""
+BUS_ITEM_SELECTOR = '.bus-item'
+# Matches once the results have rendered, whether or not any bus runs that day
+SEARCH_RESULTS_SELECTOR = f"{BUS_ITEM_SELECTOR}, .no-buses"
+BUS_INFO_SELECTORS = {
+    'operator_name': '.travels',
+    'bus_type': '.bus-type',
+    'departure_time': '.dp-time',
+    'duration': '.dur',
+    'arrival_time': '.bp-time',
+    'rating': '.rating',
+    'starting_price': '.fare',
+    'seats_available': '.seat-left',
+}
+VIEW_SEATS_SELECTOR = '.button'
+SEAT_MAP_SELECTOR = '.seat-map-container'
+SEAT_SELECTOR = '.seat'
+SEAT_TYPE_SELECTOR = '.seat-type-fare'
+SEAT_FARE_SELECTORS = {
+    'seat_category': '.seat-type',
+    'fare': '.fare-details',
+    'available_seats': '.available-seats',
+}
+
+# Completed route scrapes are served from disk for this long before the site is hit again
+ROUTE_CACHE_DIR = "data/route_cache"
+ROUTE_CACHE_TTL = 3600
+ROUTE_CACHE_SIZE_LIMIT = 2 ** 30
+
+# Navigations to the site per run, shared by every scraper on a BrowserPool and split
+# between pools when routes run in several processes; bursts beyond this start
+# drawing 429s, which cost far more than waiting
+NAVIGATIONS_PER_MINUTE = 120
+NAVIGATION_ATTEMPTS = 4
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Result pages opened per route to read seat maps in parallel
+FARE_PAGE_CONCURRENCY = 4
+
+# Spellings tried when rewriting a remembered search-results URL for another date
+SEARCH_URL_DATE_FORMATS = ("%d-%b-%Y", "%d-%m-%Y", "%Y-%m-%d")
+
+# Installed once per page by BrowserPool, so each extraction only ships its
+# arguments. Reads every field of every matching row in one round trip; fields
+# whose element is missing come back as 'N/A'
+INSTALL_EXTRACTORS_JS = """window.__extractRows = (rowSelector, fieldSelectors) => {
+    const fields = Object.entries(fieldSelectors);
+    return Array.from(document.querySelectorAll(rowSelector), row => {
+        const data = {};
+        for (const [key, sel] of fields) {
+            data[key] = row.querySelector(sel)?.innerText ?? 'N/A';
+        }
+        return data;
+    });
+};"""
+EXTRACT_ROWS_JS = "([rowSelector, fieldSelectors]) => window.__extractRows(rowSelector, fieldSelectors)"
+# Class names of the first few seats, for seat maps without a fare table
+EXTRACT_SEATS_JS = "els => els.slice(0, 10).map(e => e.className)"
+
+# Used only if fake_useragent's bundled data can't be loaded
+FALLBACK_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+USER_AGENT_SAMPLE_SIZE = 64
+
+@functools.lru_cache(maxsize=None)
+def user_agent_pool() -> Tuple[str, ...]:
+    """Distinct user agents sampled once per process, so new contexts just pick one"""
+    try:
+        ua = UserAgent()
+        return tuple({ua.random for _ in range(USER_AGENT_SAMPLE_SIZE)})
+    except FakeUserAgentError:
+        return FALLBACK_USER_AGENTS
+
+@functools.lru_cache(maxsize=1)
+def _day_after(ordinal: int) -> str:
+    return date.fromordinal(ordinal + 1).isoformat()
+
+def default_journey_date() -> str:
+    """Tomorrow as YYYY-MM-DD, formatted once per day rather than on every call"""
+    return _day_after(date.today().toordinal())
+
+def block_unneeded_requests(route: Route) -> Awaitable[None]:
+    # Plain function returning Playwright's own coroutine, which it awaits for us;
+    # this runs for every request, so skip wrapping it in a second coroutine
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        return route.abort()
+    return route.continue_()
+
+def disable_playwright_stack_capture():
+    """Stop Playwright from walking the Python stack on every API call.
+
+    Its connection layer calls inspect.stack() and traceback.extract_stack() per call
+    only to label traces and error messages, which costs more CPU than the scraping
+    itself. Set PW_INSPECT_STACK=1 to keep the original behaviour while debugging.
+    """
+    if os.environ.get("PW_INSPECT_STACK"):
+        return
+    
+    from playwright._impl import _connection
+    
+    _connection.inspect = SimpleNamespace(**{**vars(inspect), "stack": lambda context=1: []})
+    _connection.traceback = SimpleNamespace(
+        **{**vars(traceback), "extract_stack": lambda f=None, limit=None: traceback.StackSummary()}
+    )
+
+class BrowserPool:
+    """A single Chromium instance shared by many scrapers.
+
+    Launching the browser is the expensive part, so it happens once in start();
+    each scraper then gets its own lightweight context via acquire_page().
+    """
+
+    def __init__(self, headless: bool = True, navigations_per_minute: int = NAVIGATIONS_PER_MINUTE):
         self.headless = headless
-        self.browser: Optional[Browser] = None
-        self.page: Optional[Page] = None
-        self.ua = UserAgent()
-        self.base_url = "https://www.redbus.in"
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('logs/scraper.log'),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        self.user_agents = user_agent_pool()
+        self.rate_limiter = AsyncLimiter(navigations_per_minute, 60)
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
 
-    async def initialize_browser(self):
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(
+    async def start(self):
+        disable_playwright_stack_capture()
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(
             headless=self.headless,
             args=['--no-sandbox', '--disable-dev-shm-usage']
         )
+
+    @asynccontextmanager
+    async def acquire_page(self) -> AsyncIterator[Page]:
+        """Yield a page in a fresh browser context, closing the context on exit"""
+        if not self._browser:
+            raise RuntimeError("BrowserPool.start() must be called before acquire_page()")
         
-        context = await self.browser.new_context(
-            user_agent=self.ua.random,
+        context = await self._browser.new_context(
+            user_agent=random.choice(self.user_agents),
             viewport={'width': 1920, 'height': 1080}
         )
         
-        self.page = await context.new_page()
-        await self.page.set_extra_http_headers({
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
-
-    async def search_buses(self, source: str, destination: str, journey_date: str = None) -> str:
+        try:
+            await context.route("**/*", block_unneeded_requests)
+            await context.add_init_script(script=INSTALL_EXTRACTORS_JS)
+            # Set on the context so extra pages opened from it send them too
+            await context.set_extra_http_headers({
+                'Accept-Language': 'en-US,en;q=0.9',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+            })
+            page = await context.new_page()
+            yield page
+        finally:
+            await context.close()
+
+    async def close(self):
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+class JsonlWriter:
+    """Appends scraped buses to a JSONL file from a single consumer task.
+
+    Scrapers only enqueue, so concurrent routes never interleave partial lines
+    and nothing has to be held in memory until the whole run finishes. A failed
+    write is raised from the next put() and from close().
+    """
+
+    def __init__(self, path: str, maxsize: int = 1024):
+        self.path = path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._file: Optional[BinaryIO] = None
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[Exception] = None
+
+    async def start(self):
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Opened here so a bad path fails the run up front rather than inside the consumer
+        self._file = path.open('ab')
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, item: Dict) -> Awaitable[None]:
+        self._raise_if_failed()
+        return self._queue.put(item)
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                # After a failure keep draining, so put() and close() never wait on a full queue
+                if self._error is None:
+                    self._file.write(orjson.dumps(item) + b"\n")
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f"Writing {self.path} failed: {self._error}") from self._error
+
+    async def close(self):
+        """Wait for queued lines to be written, then stop the consumer"""
+        if self._task:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._file.close()
+            self._file = None
+            self._raise_if_failed()
+
+class RedBusScraper:
+    # (source, destination) -> (search results URL, journey_date it was opened for),
+    # shared so every scraper in the process benefits from earlier searches
+    _search_urls: Dict[Tuple[str, str], Tuple[str, str]] = {}
+    # One lock per route cache key, so concurrent scrapes of the same route run and store once
+    _route_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    
+    def __init__(self, headless: bool = True, writer: Optional[JsonlWriter] = None):
+        self.headless = headless
+        self.writer = writer
+        self.pool: Optional[BrowserPool] = None
+        self.base_url = "https://www.redbus.in"
+        self._owns_pool = False
+        self._cache = diskcache.Cache(ROUTE_CACHE_DIR, size_limit=ROUTE_CACHE_SIZE_LIMIT)
+        
+        self.logger = logging.getLogger(__name__)
+
+    async def initialize_browser(self, pool: Optional[BrowserPool] = None):
+        """Use the shared pool, or launch a private browser if no pool is given.
+
+        No page is held here: every scrape_route call opens its own context, so
+        one scraper can drive several routes concurrently.
+        """
+        if pool is None:
+            pool = BrowserPool(headless=self.headless)
+            await pool.start()
+            self._owns_pool = True
+        
+        self.pool = pool
+
+    async def search_buses(self, page: Page, source: str, destination: str, journey_date: str = None) -> str:
         if not journey_date:
-            journey_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+            journey_date = default_journey_date()
+        
+        search_url = self._cached_search_url(source, destination, journey_date)
+        if search_url:
+            try:
+                await self._goto(page, search_url)
+                await page.wait_for_selector(SEARCH_RESULTS_SELECTOR, timeout=10000)
+                self.logger.info("Reused search results URL: %s", search_url)
+                return page.url
+            except PlaywrightTimeoutError:
+                self.logger.warning("Cached search URL gave no listings, searching again: %s", search_url)
         
         try:
-            await self.page.goto(self.base_url, wait_until='networkidle')
-            await asyncio.sleep(random.uniform(2, 4))
+            await self._goto(page, self.base_url)
+            await page.wait_for_selector(SOURCE_INPUT_SELECTOR, timeout=10000)
 
-            await self.page.fill('input[id="src"]', source)
-            await asyncio.sleep(random.uniform(1, 2))
-            
-            await self.page.click('ul[class*="sc-dnqmqq"] li:first-child')
-            await asyncio.sleep(random.uniform(1, 2))
+            # Clicks auto-wait for the suggestion to appear
+            await page.fill(SOURCE_INPUT_SELECTOR, source)
+            await page.click(CITY_SUGGESTION_SELECTOR)
+            await self._wait_for_city_picked(page, SOURCE_INPUT_SELECTOR, source)
 
-            await self.page.fill('input[id="dest"]', destination)
-            await asyncio.sleep(random.uniform(1, 2))
-            
-            await self.page.click('ul[class*="sc-dnqmqq"] li:first-child')
-            await asyncio.sleep(random.uniform(1, 2))
+            await page.fill(DESTINATION_INPUT_SELECTOR, destination)
+            await page.click(CITY_SUGGESTION_SELECTOR)
+            await self._wait_for_city_picked(page, DESTINATION_INPUT_SELECTOR, destination)
 
-            date_input = self.page.locator('input[id="onward_cal"]')
+            date_input = page.locator(DATE_INPUT_SELECTOR)
             await date_input.click()
-            await asyncio.sleep(1)
             
             formatted_date = datetime.strptime(journey_date, "%Y-%m-%d").strftime("%d-%m-%Y")
             await date_input.fill(formatted_date)
-            await asyncio.sleep(1)
 
-            search_button = self.page.locator('button[id="search_button"]')
+            search_button = page.locator(SEARCH_BUTTON_SELECTOR)
             await search_button.click()
             
-            await self.page.wait_for_load_state('networkidle')
-            await asyncio.sleep(random.uniform(3, 5))
+            # networkidle never settles while trackers keep beaconing; wait for the results instead
+            await page.wait_for_selector(SEARCH_RESULTS_SELECTOR, timeout=20000)
             
-            current_url = self.page.url
-            self.logger.info(f"Navigated to search results: {current_url}")
+            current_url = page.url
+            self.logger.info("Navigated to search results: %s", current_url)
+            if current_url.rstrip('/') != self.base_url:
+                self._search_urls[(source, destination)] = (current_url, journey_date)
             return current_url
             
         except Exception as e:
-            self.logger.error(f"Error during bus search: {str(e)}")
+            self.logger.error("Error during bus search: %s", e)
             raise
 
-    async def get_bus_listings(self) -> List[Dict]:
-        bus_listings = []
-        
+    async def _wait_for_city_picked(self, page: Page, input_selector: str, typed: str):
+        """Wait for a clicked suggestion to be applied, so the next field can't pick a stale one.
+
+        Running out of time is not an error: if the picked city reads exactly as typed and
+        the list stays mounted, this costs no more than the fixed sleep it replaced.
+        """
         try:
-            await self.page.wait_for_selector('.bus-item', timeout=10000)
-            
-            bus_items = await self.page.query_selector_all('.bus-item')
-            self.logger.info(f"Found {len(bus_items)} bus listings")
+            await page.wait_for_function(CITY_PICKED_JS, arg=[input_selector, CITY_SUGGESTION_SELECTOR, typed],
+                                         timeout=CITY_PICK_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            self.logger.debug("No city pick detected for %s, continuing", input_selector)
+
+    async def _goto(self, page: Page, url: str):
+        """Navigate through the pool's rate limiter, backing off on 429 and 5xx responses.
+
+        Raises RuntimeError if the site still answers 429/5xx after NAVIGATION_ATTEMPTS tries.
+        """
+        for attempt in range(NAVIGATION_ATTEMPTS):
+            async with self.pool.rate_limiter:
+                response = await page.goto(url, wait_until='domcontentloaded')
             
-            for i, bus_item in enumerate(bus_items):
-                try:
-                    bus_data = await self.extract_bus_basic_info(bus_item)
-                    bus_data['listing_index'] = i
-                    bus_listings.append(bus_data)
-                    
-                except Exception as e:
-                    self.logger.warning(f"Error extracting bus {i}: {str(e)}")
-                    continue
-                    
-            return bus_listings
+            if response is None or response.status not in RETRYABLE_STATUSES:
+                return response
             
-        except Exception as e:
-            self.logger.error(f"Error getting bus listings: {str(e)}")
-            return []
+            if attempt + 1 < NAVIGATION_ATTEMPTS:
+                delay = min(2 ** attempt, 30)
+                self.logger.warning("Got HTTP %d for %s, retrying in %ds", response.status, url, delay)
+                await asyncio.sleep(delay)
+        
+        raise RuntimeError(f"Got HTTP {response.status} for {url} after {NAVIGATION_ATTEMPTS} attempts")
 
-    async def extract_bus_basic_info(self, bus_item) -> Dict:
-        bus_data = {}
+    def _cached_search_url(self, source: str, destination: str, journey_date: str) -> Optional[str]:
+        """Results URL from an earlier search of this route, moved to journey_date.
+
+        Going straight to it skips loading the home page and driving the
+        autocomplete form. Returns None when no date in the URL can be recognised.
+        """
+        cached = self._search_urls.get((source, destination))
+        if not cached:
+            return None
+        
+        url, cached_date = cached
+        if cached_date == journey_date:
+            return url
         
+        old_date = datetime.strptime(cached_date, "%Y-%m-%d")
+        new_date = datetime.strptime(journey_date, "%Y-%m-%d")
+        for date_format in SEARCH_URL_DATE_FORMATS:
+            old_text = old_date.strftime(date_format)
+            if old_text in url:
+                return url.replace(old_text, new_date.strftime(date_format))
+        return None
+
+    async def get_bus_listings(self, page: Page) -> List[Dict]:
         try:
-            bus_name = await bus_item.query_selector('.travels')
-            bus_data['operator_name'] = await bus_name.inner_text() if bus_name else 'N/A'
-            
-            bus_type = await bus_item.query_selector('.bus-type')
-            bus_data['bus_type'] = await bus_type.inner_text() if bus_type else 'N/A'
-            
-            departure_time = await bus_item.query_selector('.dp-time')
-            bus_data['departure_time'] = await departure_time.inner_text() if departure_time else 'N/A'
-            
-            duration = await bus_item.query_selector('.dur')
-            bus_data['duration'] = await duration.inner_text() if duration else 'N/A'
+            await page.wait_for_selector(SEARCH_RESULTS_SELECTOR, timeout=10000)
             
-            arrival_time = await bus_item.query_selector('.bp-time')
-            bus_data['arrival_time'] = await arrival_time.inner_text() if arrival_time else 'N/A'
+            bus_listings = await page.evaluate(EXTRACT_ROWS_JS, [BUS_ITEM_SELECTOR, BUS_INFO_SELECTORS])
+            self.logger.info("Found %d bus listings", len(bus_listings))
             
-            rating = await bus_item.query_selector('.rating')
-            bus_data['rating'] = await rating.inner_text() if rating else 'N/A'
+            for i, bus_data in enumerate(bus_listings):
+                bus_data['listing_index'] = i
             
-            starting_price = await bus_item.query_selector('.fare')
-            bus_data['starting_price'] = await starting_price.inner_text() if starting_price else 'N/A'
-            
-            seats_available = await bus_item.query_selector('.seat-left')
-            bus_data['seats_available'] = await seats_available.inner_text() if seats_available else 'N/A'
+            return bus_listings
             
         except Exception as e:
-            self.logger.warning(f"Error extracting basic bus info: {str(e)}")
-            
-        return bus_data
+            self.logger.error("Error getting bus listings: %s", e)
+            return []
 
-    async def get_detailed_fare_info(self, bus_index: int) -> List[Dict]:
+    async def get_detailed_fare_info(self, page: Page, bus_index: int) -> List[Dict]:
         try:
-            bus_items = await self.page.query_selector_all('.bus-item')
-            
-            if bus_index >= len(bus_items):
-                self.logger.warning(f"Bus index {bus_index} out of range")
+            # Locators resolve inside the browser, so only the one button we click is
+            # looked up instead of pulling back a handle for every listing
+            bus_items = page.locator(BUS_ITEM_SELECTOR)
+            if bus_index >= await bus_items.count():
+                self.logger.warning("Bus index %d out of range", bus_index)
                 return []
             
-            view_seats_button = await bus_items[bus_index].query_selector('.button')
-            if not view_seats_button:
-                self.logger.warning(f"View seats button not found for bus {bus_index}")
+            view_seats_button = bus_items.nth(bus_index).locator(VIEW_SEATS_SELECTOR).first
+            if not await view_seats_button.count():
+                self.logger.warning("View seats button not found for bus %d", bus_index)
                 return []
             
             await view_seats_button.click()
-            await asyncio.sleep(random.uniform(2, 4))
-            
-            await self.page.wait_for_selector('.seat-map-container', timeout=10000)
+            await page.wait_for_selector(SEAT_MAP_SELECTOR, timeout=10000)
             
-            fare_details = await self.extract_seat_fare_details()
-            
-            close_button = await self.page.query_selector('.close-canvas')
-            if close_button:
-                await close_button.click()
-                await asyncio.sleep(1)
-            
-            return fare_details
+            # The seat map is left open: _fetch_fares reads each bus on its own page and
+            # closes it straight after, so dismissing the modal would only add waits
+            return await self.extract_seat_fare_details(page)
             
         except Exception as e:
-            self.logger.error(f"Error getting detailed fare info for bus {bus_index}: {str(e)}")
+            self.logger.error("Error getting detailed fare info for bus %d: %s", bus_index, e)
             return []
 
-    async def extract_seat_fare_details(self) -> List[Dict]:
+    async def extract_seat_fare_details(self, page: Page) -> List[Dict]:
         fare_details = []
         
         try:
-            seat_types = await self.page.query_selector_all('.seat-type-fare')
+            fare_details = await page.evaluate(EXTRACT_ROWS_JS, [SEAT_TYPE_SELECTOR, SEAT_FARE_SELECTORS])
             
-            for seat_type in seat_types:
-                fare_info = {}
-                
-                seat_category = await seat_type.query_selector('.seat-type')
-                fare_info['seat_category'] = await seat_category.inner_text() if seat_category else 'N/A'
-                
-                fare_amount = await seat_type.query_selector('.fare-details')
-                fare_info['fare'] = await fare_amount.inner_text() if fare_amount else 'N/A'
-                
-                available_seats = await seat_type.query_selector('.available-seats')
-                fare_info['available_seats'] = await available_seats.inner_text() if available_seats else 'N/A'
-                
-                fare_details.append(fare_info)
-                
             if not fare_details:
-                seats = await self.page.query_selector_all('.seat')
-                for seat in seats[:10]:
-                    seat_info = {}
-                    seat_class = await seat.get_attribute('class')
-                    seat_info['seat_type'] = 'available' if 'available' in seat_class else 'booked'
-                    
-                    tooltip = await seat.get_attribute('title')
-                    if tooltip and 'Rs' in tooltip:
-                        fare_info['fare'] = tooltip
-                    
-                    fare_details.append(seat_info)
+                # Seat tooltips carry no category or seat count, so only availability is
+                # kept; these entries never become fare_data rows
+                seat_classes = await page.eval_on_selector_all(SEAT_SELECTOR, EXTRACT_SEATS_JS)
+                fare_details = [
+                    {'seat_type': 'available' if 'available' in seat_class else 'booked'}
+                    for seat_class in seat_classes
+                ]
                     
         except Exception as e:
-            self.logger.error(f"Error extracting seat fare details: {str(e)}")
+            self.logger.error("Error extracting seat fare details: %s", e)
             
         return fare_details
 
-    async def scrape_route(self, source: str, destination: str, journey_date: str = None) -> Dict:
+    async def scrape_route(self, source: str, destination: str, journey_date: str = None,
+                           force_refresh: bool = False,
+                           store: Optional[Callable[[Dict], Awaitable[bool]]] = None) -> Dict:
+        """Scrape a route, reusing a result cached within ROUTE_CACHE_TTL unless force_refresh.
+
+        Fresh results with buses are passed to store, and cached only if it returns True,
+        so a failed store is retried on the next run. Cached results come back with
+        'from_cache': True, as they were already stored.
+        """
+        journey_date = journey_date or default_journey_date()
+        key = self._cache_key(source, destination, journey_date)
+        
+        # Held until the result is stored and cached, so a concurrent scrape of the same
+        # route waits and then takes the cache hit instead of scraping and storing it again
+        async with self._route_locks[key]:
+            cached = None if force_refresh else self._cache.get(key)
+            if cached is not None:
+                self.logger.info("Using cached results for %s to %s on %s", source, destination, journey_date)
+                scrape_results = {**cached, 'from_cache': True}
+            else:
+                scrape_results = await self._scrape_route(source, destination, journey_date)
+                if store and scrape_results['buses'] and await store(scrape_results):
+                    self._cache.set(key, scrape_results, expire=ROUTE_CACHE_TTL)
+        
+        if self.writer:
+            for bus in scrape_results['buses']:
+                await self.writer.put({'route': scrape_results['route'], 'journey_date': journey_date, **bus})
+        
+        return scrape_results
+
+    @staticmethod
+    def _cache_key(source: str, destination: str, journey_date: str) -> str:
+        return f"{source.lower()}|{destination.lower()}|{journey_date}"
+
+    async def _scrape_route(self, source: str, destination: str, journey_date: str) -> Dict:
         scrape_results = {
             'route': f"{source} to {destination}",
-            'journey_date': journey_date or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"),
+            'journey_date': journey_date,
             'scraped_at': datetime.now().isoformat(),
             'buses': []
         }
         
         try:
-            await self.search_buses(source, destination, journey_date)
-            bus_listings = await self.get_bus_listings()
-            
-            for i, bus_basic_info in enumerate(bus_listings):
-                self.logger.info(f"Processing bus {i+1}/{len(bus_listings)}: {bus_basic_info.get('operator_name', 'Unknown')}")
-                
-                fare_details = await self.get_detailed_fare_info(i)
+            async with self.pool.acquire_page() as page:
+                results_url = await self.search_buses(page, source, destination, journey_date)
+                bus_listings = await self.get_bus_listings(page)
                 
-                bus_complete_info = {
-                    **bus_basic_info,
-                    'detailed_fares': fare_details,
-                    'scraped_at': datetime.now().isoformat()
-                }
+                # Seat maps are modal, so one page can only show one at a time; open the
+                # results on a few sibling pages and read the seat maps side by side
+                semaphore = asyncio.Semaphore(FARE_PAGE_CONCURRENCY)
+                fares = await asyncio.gather(*[
+                    self._fetch_fares(semaphore, page, results_url, i, len(bus_listings), bus_basic_info)
+                    for i, bus_basic_info in enumerate(bus_listings)
+                ])
                 
-                scrape_results['buses'].append(bus_complete_info)
-                
-                await asyncio.sleep(random.uniform(1, 3))
+                scraped_at = datetime.now().isoformat()
+                scrape_results['buses'] = [
+                    {
+                        **bus_basic_info,
+                        'detailed_fares': fare_details,
+                        'scraped_at': scraped_at
+                    }
+                    for bus_basic_info, fare_details in zip(bus_listings, fares)
+                ]
                 
         except Exception as e:
-            self.logger.error(f"Error scraping route {source} to {destination}: {str(e)}")
+            self.logger.error("Error scraping route %s to %s: %s", source, destination, e)
             
         return scrape_results
 
+    async def _fetch_fares(self, semaphore: asyncio.Semaphore, page: Page, results_url: str,
+                           bus_index: int, bus_count: int, bus_basic_info: Dict) -> List[Dict]:
+        """Open the results in a new page of page's context and read one bus's seat map"""
+        async with semaphore:
+            self.logger.debug("Processing bus %d/%d: %s", bus_index + 1, bus_count,
+                              bus_basic_info.get('operator_name', 'Unknown'))
+            
+            fare_page = await page.context.new_page()
+            try:
+                await self._goto(fare_page, results_url)
+                await fare_page.wait_for_selector(BUS_ITEM_SELECTOR, timeout=15000)
+                return await self.get_detailed_fare_info(fare_page, bus_index)
+            except Exception as e:
+                self.logger.error("Error loading results page for bus %d: %s", bus_index, e)
+                return []
+            finally:
+                await fare_page.close()
+
     async def close(self):
-        if self.browser:
-            await self.browser.close()
-            self.logger.info("Browser closed successfully")
\ No newline at end of file
+        self._cache.close()
+        
+        if self._owns_pool and self.pool:
+            await self.pool.close()
+            self.logger.info("Browser closed successfully")
+        self.pool = None
+        self._owns_pool = False
@@ -0,0 +1,125 @@
+import logging
+
+import pytest
+from bson import ObjectId
+
+from src.database.data_manager import DataManager, storage_succeeded
+
+
+@pytest.fixture
+def data_manager():
+    # Skip __init__, which connects to MongoDB
+    manager = object.__new__(DataManager)
+    manager.logger = logging.getLogger(__name__)
+    return manager
+
+
+def test_price_trends_empty_history(data_manager):
+    assert data_manager._calculate_price_trends([]) == {}
+
+
+def test_price_trends_single_date_is_stable(data_manager):
+    trends = data_manager._calculate_price_trends([
+        {'journey_date': '2024-03-15', 'fare': 500.0},
+        {'journey_date': '2024-03-15', 'fare': 700.0},
+    ])
+
+    assert trends == {
+        'average_fares_by_date': {'2024-03-15': 600.0},
+        'trend_percentage': 0,
+        'trend_direction': 'stable'
+    }
+
+
+def test_price_trends_compares_last_two_dates(data_manager):
+    trends = data_manager._calculate_price_trends([
+        {'journey_date': '2024-03-17', 'fare': 900.0},
+        {'journey_date': '2024-03-15', 'fare': 400.0},
+        {'journey_date': '2024-03-16', 'fare': 700.0},
+        {'journey_date': '2024-03-16', 'fare': 900.0},
+        {'journey_date': '2024-03-17', 'fare': 1100.0},
+    ])
+
+    assert list(trends['average_fares_by_date']) == ['2024-03-15', '2024-03-16', '2024-03-17']
+    assert trends['average_fares_by_date']['2024-03-16'] == 800.0
+    assert trends['trend_percentage'] == 25.0
+    assert trends['trend_direction'] == 'up'
+
+
+def test_price_trends_down(data_manager):
+    trends = data_manager._calculate_price_trends([
+        {'journey_date': '2024-03-15', 'fare': 1000.0},
+        {'journey_date': '2024-03-16', 'fare': 900.0},
+    ])
+
+    assert trends['trend_percentage'] == -10.0
+    assert trends['trend_direction'] == 'down'
+
+
+class FakeDatabase:
+    """Async DatabaseManager surface used by aprocess_scraping_results; fare inserts can be made to fail"""
+
+    def __init__(self, fail_fares=False):
+        self.fail_fares = fail_fares
+        self.fare_count = 0
+
+    async def ainsert_route(self, source, destination):
+        return ObjectId()
+
+    async def astart_scraping_session(self, route_id, journey_date):
+        return ObjectId()
+
+    async def aupdate_scraping_session(self, session_id, **fields):
+        pass
+
+    async def ainsert_operators_bulk(self, operators):
+        return {name: ObjectId() for name in operators}
+
+    async def ainsert_services_bulk(self, services):
+        return [ObjectId() for _ in services]
+
+    async def ainsert_fare_data_bulk(self, records):
+        return [None if self.fail_fares else ObjectId() for _ in records]
+
+    async def aincrement_route_fare_count(self, route_id, count):
+        self.fare_count += count
+
+
+SCRAPE_RESULTS = {
+    'route': 'Hyderabad to Bangalore',
+    'journey_date': '2024-03-15',
+    'buses': [
+        {'operator_name': 'Orange Travels', 'rating': '4.2', 'starting_price': 'Rs 850', 'detailed_fares': []},
+        {'operator_name': 'VRL Travels', 'rating': '3.9', 'starting_price': 'Rs 1,100', 'detailed_fares': []},
+    ]
+}
+
+
+async def test_complete_store_succeeds(data_manager):
+    data_manager.db = FakeDatabase()
+
+    stats = await data_manager.aprocess_scraping_results(SCRAPE_RESULTS)
+
+    assert stats['successfully_stored'] == 2
+    assert data_manager.db.fare_count == 2
+    assert storage_succeeded(stats)
+
+
+async def test_failed_fare_inserts_are_reported(data_manager):
+    data_manager.db = FakeDatabase(fail_fares=True)
+
+    stats = await data_manager.aprocess_scraping_results(SCRAPE_RESULTS)
+
+    # The services went in, but a store without its fares must not count as done
+    assert stats['successfully_stored'] == 2
+    assert stats['errors'] == ["Stored 0 of 2 fare records"]
+    assert not storage_succeeded(stats)
+
+
+def test_seat_map_fallback_entries_store_no_fares(data_manager):
+    bus = {
+        'starting_price': 'Rs 850',
+        'detailed_fares': [{'seat_type': 'available'}, {'seat_type': 'booked'}]
+    }
+
+    assert data_manager._build_fare_docs(bus, ObjectId(), '2024-03-15') == []
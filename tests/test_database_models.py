@@ -0,0 +1,74 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from pymongo import InsertOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from src.models import database_models
+from src.models.database_models import DatabaseManager
+
+
+class FakeCollection:
+    """Stands in for a collection; fails the ops at the given batch-relative indexes"""
+
+    name = "fake"
+
+    def __init__(self, failures):
+        # One entry per bulk_write call: a list of failed indexes, or an exception to raise
+        self.failures = list(failures)
+
+    def bulk_write(self, ops, ordered=True):
+        failure = self.failures.pop(0)
+        if isinstance(failure, Exception):
+            raise failure
+        if failure:
+            raise BulkWriteError({"writeErrors": [{"index": i} for i in failure]})
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(database_models, "BULK_BATCH_SIZE", 3)
+    # Skip __init__, which connects to MongoDB
+    return object.__new__(DatabaseManager)
+
+
+def ops(count):
+    return [InsertOne({"n": n}) for n in range(count)]
+
+
+def test_bulk_write_no_failures(manager):
+    assert manager._bulk_write(FakeCollection([[], []]), ops(5)) == set()
+
+
+def test_bulk_write_maps_batch_errors_to_input_indexes(manager):
+    failed = manager._bulk_write(FakeCollection([[1], [0, 1]]), ops(5))
+
+    assert failed == {1, 3, 4}
+
+
+def test_bulk_write_fails_whole_batch_on_other_errors(manager):
+    failed = manager._bulk_write(FakeCollection([[], AutoReconnect("down"), [0]]), ops(8))
+
+    assert failed == {3, 4, 5, 6}
+
+
+class FakeAsyncCollection:
+    """Async collection whose every bulk_write fails, as during an outage"""
+
+    name = "fare_data"
+
+    async def bulk_write(self, ops, ordered=True):
+        raise AutoReconnect("down")
+
+
+async def test_async_fare_bulk_insert_logs_one_warning_per_call(manager, caplog):
+    manager._async_db = SimpleNamespace(fare_data=FakeAsyncCollection())
+
+    with caplog.at_level(logging.WARNING, logger=database_models.__name__):
+        ids = await manager.ainsert_fare_data_bulk([{"fare": n} for n in range(7)])
+
+    assert ids == [None] * 7
+    assert [record.getMessage() for record in caplog.records] == [
+        "Bulk write to fare_data: 7 of 7 operations failed"
+    ]
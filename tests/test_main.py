@@ -0,0 +1,13 @@
+import pytest
+
+from main import split_evenly
+
+
+@pytest.mark.parametrize("total, parts, expected", [
+    (8, 4, [2, 2, 2, 2]),
+    (5, 3, [2, 2, 1]),
+    (120, 7, [18, 17, 17, 17, 17, 17, 17]),
+    (2, 3, [1, 1, 1]),
+])
+def test_split_evenly(total, parts, expected):
+    assert split_evenly(total, parts) == expected
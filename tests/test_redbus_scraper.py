@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+import diskcache
+import pytest
+
+from src.scraper import redbus_scraper
+from src.scraper.redbus_scraper import RedBusScraper, default_journey_date
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    # Skip __init__, which opens the on-disk route cache
+    monkeypatch.setattr(RedBusScraper, "_search_urls", {})
+    return object.__new__(RedBusScraper)
+
+
+def test_cached_search_url_unknown_route(scraper):
+    assert scraper._cached_search_url("Hyderabad", "Bangalore", "2024-03-15") is None
+
+
+def test_cached_search_url_same_date(scraper):
+    url = "https://www.redbus.in/bus-tickets/hyderabad-to-bangalore?doj=15-Mar-2024"
+    scraper._search_urls[("Hyderabad", "Bangalore")] = (url, "2024-03-15")
+
+    assert scraper._cached_search_url("Hyderabad", "Bangalore", "2024-03-15") == url
+
+
+@pytest.mark.parametrize("old_text, new_text", [
+    ("15-Mar-2024", "02-Apr-2024"),
+    ("15-03-2024", "02-04-2024"),
+    ("2024-03-15", "2024-04-02"),
+])
+def test_cached_search_url_rewrites_date(scraper, old_text, new_text):
+    url = "https://www.redbus.in/bus-tickets/hyderabad-to-bangalore?fromCityId=124&doj={}"
+    scraper._search_urls[("Hyderabad", "Bangalore")] = (url.format(old_text), "2024-03-15")
+
+    assert scraper._cached_search_url("Hyderabad", "Bangalore", "2024-04-02") == url.format(new_text)
+
+
+def test_cached_search_url_without_recognisable_date(scraper):
+    url = "https://www.redbus.in/bus-tickets/hyderabad-to-bangalore?searchId=abc123"
+    scraper._search_urls[("Hyderabad", "Bangalore")] = (url, "2024-03-15")
+
+    assert scraper._cached_search_url("Hyderabad", "Bangalore", "2024-04-02") is None
+
+
+def test_default_journey_date_is_tomorrow():
+    redbus_scraper._day_after.cache_clear()
+
+    assert default_journey_date() == (date.today() + timedelta(days=1)).isoformat()
+
+
+@pytest.fixture
+def caching_scraper(tmp_path, monkeypatch):
+    monkeypatch.setattr(RedBusScraper, "_route_locks", defaultdict(asyncio.Lock))
+    scraper = object.__new__(RedBusScraper)
+    scraper.writer = None
+    scraper.logger = logging.getLogger(__name__)
+    scraper._cache = diskcache.Cache(str(tmp_path))
+    yield scraper
+    scraper._cache.close()
+
+
+async def test_concurrent_scrapes_of_a_route_scrape_and_store_once(caching_scraper):
+    scraper = caching_scraper
+    scrapes, stores = [], []
+
+    async def fake_scrape_route(source, destination, journey_date):
+        scrapes.append(source)
+        await asyncio.sleep(0)
+        return {'route': f"{source} to {destination}", 'journey_date': journey_date, 'buses': [{'n': 1}]}
+
+    async def store(scrape_results):
+        stores.append(scrape_results)
+        await asyncio.sleep(0)
+        return True
+
+    scraper._scrape_route = fake_scrape_route
+    first, second = await asyncio.gather(
+        scraper.scrape_route("Hyderabad", "Bangalore", "2024-03-15", store=store),
+        scraper.scrape_route("Hyderabad", "Bangalore", "2024-03-15", store=store),
+    )
+
+    assert len(scrapes) == 1
+    assert len(stores) == 1
+    assert not first.get('from_cache')
+    assert second['from_cache']
+
+
+async def test_failed_store_is_not_cached(caching_scraper):
+    scraper = caching_scraper
+    scrapes = []
+
+    async def fake_scrape_route(source, destination, journey_date):
+        scrapes.append(source)
+        return {'route': f"{source} to {destination}", 'journey_date': journey_date, 'buses': [{'n': 1}]}
+
+    async def failing_store(scrape_results):
+        return False
+
+    scraper._scrape_route = fake_scrape_route
+    await scraper.scrape_route("Pune", "Goa", "2024-03-15", store=failing_store)
+    result = await scraper.scrape_route("Pune", "Goa", "2024-03-15", store=failing_store)
+
+    assert len(scrapes) == 2
+    assert not result.get('from_cache')